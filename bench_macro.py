@@ -0,0 +1,466 @@
+"""
+매크로 성능 벤치마크 (Linux/macOS, 카카오톡 불필요)
+- parse: 레벨/골드 파싱, 응답 판정을 합성 채팅 코퍼스 크기별로 측정
+- ax: AX 텍스트 추출을 지연을 주입한 가짜 AX 트리에서 마지막 1/3/5/10/전체 행으로 측정
+- e2e: 시뮬레이션 봇을 상대로 매크로 엔진 시도 1회 전체 사이클 측정 (판정이 봇의 실제 결과와 다르면 실패)
+- --memory-audit: 시뮬레이션 봇으로 수십만~백만 회 돌리며 시도당 메모리 증가를 추적해
+  워밍업 이후 Python 할당량/RSS가 일정한지(정상 상태) 확인 (실패 시 종료 코드 1)
+
+기준값(bench_baseline.json)과 비교해 threshold배 이상 느려지면 회귀로 표시하고 종료 코드 1을 반환합니다.
+
+사용법:
+    python3 bench_macro.py                    # 전체 실행 후 기준값과 비교
+    python3 bench_macro.py --only parse ax    # 일부 그룹만
+    python3 bench_macro.py --update-baseline  # 현재 결과를 기준값으로 저장
+    python3 bench_macro.py --memory-audit     # 메모리 감사 (기본 100만 회, 숫자로 횟수 지정)
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import enhance_macro as em
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_THRESHOLD = 1.5
+CORPUS_SIZES = [5, 50, 500]
+AX_ROW_COUNTS = [1, 3, 5, 10, None]   # None = 전체 행
+AX_TABLE_ROWS = 200
+AX_IPC_LATENCY = 0.0002               # 가짜 AX 속성 조회 1회 지연 (초)
+AX_OTHER_WINDOWS = 8                  # 함께 열려 있는 다른 카카오톡 창 수
+MEMORY_AUDIT_ATTEMPTS = 1_000_000
+MEMORY_AUDIT_WARMUP = 0.1             # 앞쪽 이 비율은 버퍼/캐시가 차는 구간으로 보고 판정에서 제외
+MEMORY_AUDIT_SAMPLES = 20             # 워밍업 이후 측정 지점 수
+MEMORY_AUDIT_ROWS = 1000              # 시뮬레이션 채팅 테이블 행 제한 (오래된 행은 사라짐)
+MEMORY_AUDIT_MAX_GROWTH = 1.0         # 워밍업 이후 허용 Python 할당 증가율 (시도당 바이트, 측정 지점 회귀 기울기)
+MEMORY_AUDIT_MAX_RSS_GROWTH = 32_000_000  # 워밍업 이후 허용 RSS 증가량 (바이트, 할당기 단편화 여유)
+
+
+# ============================================================
+# 합성 채팅 코퍼스 / 시뮬레이션 봇
+# ============================================================
+def bot_reply(level, gold, rng):
+    """봇 응답 한 건 (결과, 새 레벨, 메시지 리스트)."""
+    roll = rng.random()
+    success_rate = max(0.1, 1.0 - level * 0.05) if level < em.MAX_LEVEL else 0.0   # 최대 레벨에서 멈춤
+    destroy_rate = 0.1 * level / em.MAX_LEVEL
+    if roll < success_rate:
+        texts = [f"{em.SUCCESS_TEXT}하셨습니다! +{level} → +{level + 1}", f"남은 골드: {gold:,}G"]
+        return 'success', level + 1, texts
+    if roll < success_rate + destroy_rate:
+        return 'destroy', 0, [f"{em.FAIL_TEXT}... [+{level}] → [+0]", f"남은 골드: {gold:,}G"]
+    return 'keep', level, [f"[+{level}] 검{em.KEEP_TEXT}", f"남은 골드: {gold:,}G"]
+
+
+def make_corpus(size, seed=0):
+    """명령어/봇 응답/잡담이 섞인 채팅 텍스트 size개."""
+    rng = random.Random(seed)
+    texts = []
+    level, gold = 0, 500_000_000
+    while len(texts) < size:
+        if rng.random() < 0.2:
+            texts.append(rng.choice(["ㅋㅋㅋ", "오 대박", "강화 가즈아", "오후 3:12", "사진"]))
+            continue
+        texts.append(em.COMMAND)
+        gold -= 100_000
+        _, level, reply = bot_reply(level, gold, rng)
+        texts.extend(reply)
+    return texts[:size]
+
+
+class SimulatedBot:
+    """MacroEngine용 가짜 채팅 백엔드 (AX 행 읽기 방식).
+    전송 후 reply_delay초가 지나면 봇 응답 행이 추가된다. 각 호출에 지연을 줄 수 있다.
+    """
+
+    def __init__(self, level=0, seed=0, read_latency=0.0, send_latency=0.0, reply_delay=0.0,
+                 max_rows=None):
+        self.rng = random.Random(seed)
+        self.level = level
+        self.gold = 10 ** 12
+        self.rows = [["채팅방에 입장했습니다"]]
+        self.read_latency = read_latency
+        self.send_latency = send_latency
+        self.reply_delay = reply_delay
+        self.max_rows = max_rows       # 테이블 행 제한 (None = 무제한, 메모리 감사 시 사용)
+        self.row_count = 1
+        self.pending_at = None
+        self.outcomes = {"success": 0, "keep": 0, "destroy": 0}   # 봇이 실제로 보낸 결과 (엔진 판정 검증용)
+        self.lock = threading.Lock()
+
+    def _append(self, row):
+        self.rows.append(row)
+        self.row_count += 1
+        if self.max_rows is not None and len(self.rows) > self.max_rows:
+            del self.rows[0]
+
+    def _deliver(self):
+        if self.pending_at is not None and time.monotonic() >= self.pending_at:
+            self.pending_at = None
+            self.gold -= 100_000
+            result, self.level, reply = bot_reply(self.level, self.gold, self.rng)
+            self.outcomes[result] += 1
+            for text in reply:
+                self._append([text])
+
+    def window_exists(self, room_name):
+        return True
+
+    def read_rows(self, room_name):
+        if self.read_latency:
+            time.sleep(self.read_latency)
+        with self.lock:
+            self._deliver()
+            return self.row_count, [list(row) for row in self.rows[-5:]]
+
+    def read_texts(self, room_name):
+        return None
+
+    def send(self, command, room_name, stats=None):
+        if self.send_latency:
+            time.sleep(self.send_latency)
+        with self.lock:
+            self._append([command])
+            self.pending_at = time.monotonic() + self.reply_delay
+        return True
+
+
+# ============================================================
+# 가짜 AX 트리 (지연 주입)
+# ============================================================
+class FakeElement:
+    __slots__ = ('attrs',)
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+
+
+class FakeAX:
+    """ApplicationServices 대역: 속성 조회마다 latency초 busy-wait (IPC 비용 흉내)."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def AXUIElementCopyAttributeValue(self, element, attr, _):
+        self.calls += 1
+        if self.latency:
+            end = time.perf_counter() + self.latency
+            while time.perf_counter() < end:
+                pass
+        value = element.attrs.get(attr)
+        return (0, value) if value is not None else (-25212, None)
+
+
+def make_ax_tree(room_name, row_count, other_windows=0):
+    """카카오톡 채팅창 구조(창 > ScrollArea > Table > 행 > 셀 > 텍스트)를 흉내 낸 트리.
+    other_windows개의 다른 채팅방 창이 앞쪽에 함께 열려 있다."""
+    rows = []
+    for text in make_corpus(row_count, seed=1):
+        label = FakeElement(AXRole="AXStaticText", AXValue=text)
+        cell = FakeElement(AXRole="AXCell", AXChildren=[label])
+        rows.append(FakeElement(AXRole="AXRow", AXChildren=[cell]))
+    table = FakeElement(AXRole="AXTable", AXRows=rows, AXChildren=rows)
+    scroll = FakeElement(AXRole="AXScrollArea", AXChildren=[table])
+    window = FakeElement(AXRole="AXWindow", AXTitle=room_name, AXChildren=[scroll])
+    others = [FakeElement(AXRole="AXWindow", AXTitle=f"다른방 {i}", AXChildren=[])
+              for i in range(other_windows)]
+    return FakeElement(AXRole="AXApplication", AXWindows=others + [window])
+
+
+@contextlib.contextmanager
+def fake_ax(app, latency):
+    """enhance_macro의 AX 모듈과 앱 핸들 캐시를 가짜로 교체."""
+    saved = (getattr(em, 'AX', None), em._ax_app, em._ax_pid_checked_at, em.AX_PID_CHECK_INTERVAL,
+             em.use_ax_api)
+    em.AX = FakeAX(latency)
+    em.use_ax_api = True
+    em._ax_app = app
+    em._ax_pid_checked_at = time.monotonic()
+    em.AX_PID_CHECK_INTERVAL = float('inf')
+    try:
+        yield em.AX
+    finally:
+        em.AX, em._ax_app, em._ax_pid_checked_at, em.AX_PID_CHECK_INTERVAL, em.use_ax_api = saved
+        em.WINDOWS.invalidate()
+        if em.AX is None:
+            del em.AX
+
+
+# ============================================================
+# 측정
+# ============================================================
+def measure(func, min_time=0.05, repeat=5):
+    """func 1회 소요 시간(초). 반복 묶음당 min_time 이상 돌리고 repeat번 중 최솟값."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def bench_parse():
+    results = {}
+    for size in CORPUS_SIZES:
+        texts = make_corpus(size)
+        previous = texts[:max(1, size - 3)]
+        results[f"parse_level_change[{size}]"] = measure(lambda: em.parse_level_change(texts))
+        results[f"scan_current_level[{size}]"] = measure(lambda: em.scan_current_level(texts))
+        results[f"parse_remaining_gold[{size}]"] = measure(lambda: em.parse_remaining_gold(texts))
+        results[f"check_response[{size}]"] = measure(lambda: em.check_response(texts, previous, 5))
+        results[f"fuzzy_classify[{size}]"] = measure(lambda: em.OCR_MATCHER.classify(texts[-6:], 5))
+    return results
+
+
+def bench_ax():
+    results = {}
+    room = "벤치방"
+    app = make_ax_tree(room, AX_TABLE_ROWS, AX_OTHER_WINDOWS)
+    with fake_ax(app, AX_IPC_LATENCY) as ax:
+        for n in AX_ROW_COUNTS:
+            last_n = n or AX_TABLE_ROWS
+            label = f"last_{n}" if n else "all"
+            em.WINDOWS.invalidate()
+            ax.calls = 0
+            em.read_chat_rows_ax(room, last_n)
+            first_calls, ax.calls = ax.calls, 0
+            em.read_chat_rows_ax(room, last_n)
+            calls = ax.calls
+            results[f"ax_read[{label}]"] = measure(lambda: em.read_chat_rows_ax(room, last_n),
+                                                   repeat=3)
+            print(f"  ax_read[{label}]: AX 호출 {calls}회 (창 목록을 읽는 첫 호출 {first_calls}회)")
+    return results
+
+
+OUTCOME_MISMATCHES = []   # e2e 실행 중 엔진 판정과 봇 결과가 어긋난 기록
+
+
+def _run_attempts(bot, attempts, poll_interval):
+    stats = em.EnhanceStats(filename=None)
+    engine = em.MacroEngine(stats, backend=bot)
+    session = em.MacroSession("벤치방", 0, target_level=em.MAX_LEVEL + 1)
+    saved_poll = em.REPLY_POLL_INTERVAL
+    em.REPLY_POLL_INTERVAL = poll_interval
+
+    async def _stop_after():
+        while session.attempts < attempts:
+            await asyncio.sleep(0.001)
+        engine.stop()
+
+    async def _main():
+        watcher = asyncio.ensure_future(_stop_after())
+        await engine.run(session)
+        watcher.cancel()
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(_main())
+    finally:
+        em.REPLY_POLL_INTERVAL = saved_poll
+    judged = {result: session.outcomes[result] for result in bot.outcomes}
+    if judged != bot.outcomes:
+        # 판정이 봇의 실제 결과와 다르면 (거짓 성공 후 재전송 등) 측정값이 실제 시도가 아니다
+        OUTCOME_MISMATCHES.append(f"판정 {judged} != 봇 {bot.outcomes}")
+    return (time.perf_counter() - start) / max(session.attempts, 1)
+
+
+def bench_e2e():
+    """엔진 오버헤드만 (지연 0) / 실제와 비슷한 지연 (읽기 5ms, 전송 20ms, 봇 응답 50ms).
+    매 실행마다 세션의 결과 집계가 봇이 실제로 보낸 결과와 같은지 확인한다."""
+    results = {}
+    results["attempt[no_latency]"] = min(
+        _run_attempts(SimulatedBot(seed=s), 200, poll_interval=0.0) for s in range(3))
+    results["attempt[latency]"] = _run_attempts(
+        SimulatedBot(seed=0, read_latency=0.005, send_latency=0.02, reply_delay=0.05),
+        30, poll_interval=0.01)
+    return results
+
+
+GROUPS = {"parse": bench_parse, "ax": bench_ax, "e2e": bench_e2e}
+
+
+# ============================================================
+# 메모리 감사
+# ============================================================
+def rss_bytes():
+    """현재 RSS. /proc가 없으면 (macOS) 최대 RSS로 대신한다."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _slope(points):
+    """(x, y) 점들의 최소제곱 기울기 (측정 잡음에 덜 민감한 증가율)."""
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var if var else 0.0
+
+
+def memory_audit(attempts):
+    """시뮬레이션 봇 상대로 attempts회 실행하며 Python 할당량(tracemalloc)/할당 블록 수/RSS를 기록하고,
+    워밍업 이후 시도당 증가량이 한도 이내인지 확인. 통계는 임시 DB, 로그는 회전 파일로 실제 경로 그대로 쓴다.
+    """
+    warmup = max(1, int(attempts * MEMORY_AUDIT_WARMUP))
+    step = max(1, (attempts - warmup) // MEMORY_AUDIT_SAMPLES)
+    samples = []        # (시도 수, Python 할당 바이트, 할당 블록 수, RSS)
+    snapshots = []
+    saved = (em.REPLY_POLL_INTERVAL, em.LOG_LEVEL, em.LOG_FILE, em.LOG_FILE_MAX_BYTES, em.LOG_FILE_BACKUPS)
+    with tempfile.TemporaryDirectory() as tmp:
+        em.REPLY_POLL_INTERVAL = 0.0
+        em.LOG_LEVEL = "WARNING"
+        em.LOG_FILE = os.path.join(tmp, "audit.log")
+        em.LOG_FILE_MAX_BYTES, em.LOG_FILE_BACKUPS = 1_000_000, 1
+        stats = em.EnhanceStats(filename=os.path.join(tmp, "audit.db"))
+        engine = em.MacroEngine(stats, backend=SimulatedBot(seed=0, max_rows=MEMORY_AUDIT_ROWS))
+        session = em.MacroSession("벤치방", 0, target_level=10 ** 9)   # 목표 도달로 끝나지 않게
+
+        def sample():
+            gc.collect()
+            current, _ = tracemalloc.get_traced_memory()
+            samples.append((session.attempts, current, sys.getallocatedblocks(), rss_bytes()))
+            print(f"  {session.attempts:>11,}회  Python {current / 1e6:8.2f}MB  "
+                  f"블록 {samples[-1][2]:>10,}  RSS {samples[-1][3] / 1e6:8.1f}MB", flush=True)
+
+        async def _sampler():
+            next_at = warmup
+            while session.attempts < attempts:
+                if session.attempts >= next_at:
+                    sample()
+                    if not snapshots:
+                        snapshots.append(tracemalloc.take_snapshot())
+                    next_at += step
+                await asyncio.sleep(0.01)
+            engine.stop()
+
+        async def _main():
+            sampler = asyncio.ensure_future(_sampler())
+            await engine.run(session)
+            sampler.cancel()
+
+        print(f"[메모리 감사] {attempts:,}회 (워밍업 {warmup:,}회 이후 {MEMORY_AUDIT_SAMPLES}회 측정)")
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            asyncio.run(_main())
+            sample()
+            snapshots.append(tracemalloc.take_snapshot())
+        finally:
+            tracemalloc.stop()
+            (em.REPLY_POLL_INTERVAL, em.LOG_LEVEL, em.LOG_FILE, em.LOG_FILE_MAX_BYTES,
+             em.LOG_FILE_BACKUPS) = saved
+        elapsed = time.perf_counter() - start
+
+    if session.attempts < attempts or len(snapshots) < 2:
+        print(f"[메모리 감사] {session.attempts:,}회에서 세션 종료 ({session.finish_reason}) - 판정 불가")
+        return False
+    (base_n, base_mem, base_blocks, base_rss), (last_n, last_mem, last_blocks, last_rss) = samples[0], samples[-1]
+    done = last_n - base_n
+    growth = _slope([(n, mem) for n, mem, _, _ in samples])
+    rss_growth = last_rss - base_rss
+    print("\n" + "=" * 72)
+    print(f"  {session.attempts:,}회, {elapsed:.0f}초 ({elapsed / max(session.attempts, 1) * 1e3:.2f}ms/회)")
+    print(f"  워밍업 이후 {done:,}회: Python 할당 {(last_mem - base_mem) / 1e3:+,.1f}KB "
+          f"(시도당 {growth:+.3f}B, 한도 {MEMORY_AUDIT_MAX_GROWTH}B), 블록 {last_blocks - base_blocks:+,}, "
+          f"RSS {rss_growth / 1e6:+.1f}MB")
+    print("  증가량 상위 할당 위치:")
+    for stat in snapshots[-1].compare_to(snapshots[0], "lineno")[:5]:
+        print(f"    {stat}")
+    ok = growth <= MEMORY_AUDIT_MAX_GROWTH and rss_growth <= MEMORY_AUDIT_MAX_RSS_GROWTH
+    print(f"  {'정상 상태 (메모리 증가 없음)' if ok else '메모리 증가 감지'}")
+    print("=" * 72)
+    return ok
+
+
+def format_time(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.2f}ms"
+    return f"{seconds * 1e6:9.2f}us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="매크로 성능 벤치마크")
+    parser.add_argument("--only", nargs="+", choices=sorted(GROUPS), help="실행할 그룹")
+    parser.add_argument("--update-baseline", action="store_true", help="현재 결과를 기준값으로 저장")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"회귀 판정 배수 (기본 {DEFAULT_THRESHOLD})")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="기준값 파일")
+    parser.add_argument("--output", help="결과 JSON 저장 파일")
+    parser.add_argument("--memory-audit", type=int, nargs="?", const=MEMORY_AUDIT_ATTEMPTS, metavar="N",
+                        help=f"메모리 감사만 실행 (기본 {MEMORY_AUDIT_ATTEMPTS:,}회)")
+    args = parser.parse_args()
+    if args.memory_audit:
+        return 0 if memory_audit(args.memory_audit) else 1
+
+    results = {}
+    for name in args.only or list(GROUPS):
+        print(f"[{name}] 측정 중...")
+        results.update(GROUPS[name]())
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get("results", {})
+
+    regressions = []
+    print("\n" + "=" * 72)
+    print(f"  {'벤치마크':<36}{'현재':>12}{'기준':>12}{'배수':>8}")
+    print("  " + "-" * 68)
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base:
+            ratio = value / base
+            mark = " <- 회귀" if ratio > args.threshold else ""
+            if mark:
+                regressions.append(name)
+            print(f"  {name:<36}{format_time(value):>12}{format_time(base):>12}{ratio:>7.2f}x{mark}")
+        else:
+            print(f"  {name:<36}{format_time(value):>12}{'-':>12}")
+    print("=" * 72)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"results": results}, f, indent=2)
+    if OUTCOME_MISMATCHES:
+        for mismatch in OUTCOME_MISMATCHES:
+            print(f"  [불일치] {mismatch}")
+        print("  e2e 판정이 봇 결과와 달라 기준값으로 쓸 수 없음")
+        return 1
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"python": sys.version.split()[0], "results": baseline}, f, indent=2)
+        print(f"  기준값 저장: {args.baseline}")
+        return 0
+    if regressions:
+        print(f"  회귀 {len(regressions)}건 (기준 대비 {args.threshold}배 초과): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,32 @@
 카카오톡 강화 매크로 (macOS 버전 - AX API)
 """
 
+import argparse
+import asyncio
+import bisect
+import contextlib
+import difflib
+import fcntl
+import gzip
+import http.server
+import logging
+import logging.handlers
+import signal
+import socket
+import sqlite3
+import stat
 import subprocess
+import threading
 import time
 import random
 import json
 import os
+import queue
 import re
+import sys
+import unicodedata
+from collections import deque
+from itertools import islice
 
 # AX API (pyobjc) — 채팅 텍스트 직접 읽기
 try:
@@ -16,6 +36,20 @@ try:
 except ImportError:
     AX_AVAILABLE = False
 
+# 창 열림/닫힘 알림 (AXObserver 런루프용)
+try:
+    import CoreFoundation
+    AX_OBSERVER_AVAILABLE = AX_AVAILABLE
+except ImportError:
+    AX_OBSERVER_AVAILABLE = False
+
+# 키 이벤트 직접 전송 (Quartz) — AppleScript 없이 Enter 입력
+try:
+    import Quartz
+    KEY_EVENT_AVAILABLE = True
+except ImportError:
+    KEY_EVENT_AVAILABLE = False
+
 # OCR fallback (AX API 불가 시)
 try:
     import pyautogui
@@ -33,18 +67,56 @@ TARGET_LEVEL = 15              # 이 레벨 도달하면 정지 (예: 4면 +4 
 SUCCESS_TEXT = "강화에 성공"
 FAIL_TEXT = "강화 파괴"
 KEEP_TEXT  = "의 레벨이 유지되었습니다"
-STATS_FILE = "enhance_stats.json"
+STATS_FILE = "enhance_stats.db"   # SQLite 통계 저장소 (여러 프로세스가 함께 기록 가능)
+LEGACY_STATS_FILE = "enhance_stats.json"  # 기존 JSON 통계 (처음 열 때 한 번 가져옴)
+STATS_DB_TIMEOUT = 10.0        # 다른 프로세스의 쓰기 잠금 대기 상한 (초)
+STATS_RECENT_WINDOW = 2000     # 통계 출력 시 레벨별 최근 성공률 구간 (회)
+CHECKPOINT_FILE = "macro_checkpoint.json"  # 채팅방별 재개 지점 (빈 문자열 = 사용 안 함)
+TRACE_FILE = ""                # 실행 중 읽기/전송 기록 파일 (빈 문자열 = 기록 안 함, .gz면 압축)
 COMMAND = "/강화"
 GOLD_LIMIT = 0                 # 이 골드 미만이 되면 정지 (0 = 기능 비활성화, 예: 100_000_000)
 MAX_LEVEL = 20                 # 강화 최대 레벨 (OCR 오인식 필터용)
+FUZZY_ACCEPT_CONFIDENCE = 0.8  # OCR 퍼지 판정을 즉시 채택하는 최소 신뢰도 (0~1)
+# 봇 쿨다운/과속 응답 키워드 (숫자가 있으면 '(N)초 후' 형태로 대기 시간 추출)
+COOLDOWN_PATTERNS = [
+    r'(\d+(?:\.\d+)?)\s*초\s*(?:후|뒤)',
+    r'잠시\s*후',
+    r'너무\s*빠',
+    r'쿨\s*타임',
+    r'천천히',
+]
+
+# AX 직접 전송 대기 상한 (조건 충족 시 즉시 진행, 기존 고정 딜레이를 상한으로 사용)
+SEND_POPUP_TIMEOUT = 0.25      # 입력 후 자동완성 팝업 표시 대기
+SEND_SELECT_TIMEOUT = 0.1      # 첫 Enter 후 팝업 닫힘 대기
+SEND_CLEAR_TIMEOUT = 0.3       # 두 번째 Enter 후 입력창 비워짐 대기
+SEND_POLL_INTERVAL = 0.01      # 조건 확인 주기
+SEND_CONFIRM_TIMEOUT = 0.4     # 전송 후 내 명령어 행이 채팅에 나타나기까지 대기 상한
+SEND_CONFIRM_POLL = 0.03       # 전송 확인 폴링 주기
+SEND_MAX_RETRIES = 2           # 전송 미확인 시 즉시 재전송 횟수 (0 = 재전송 안 함)
+SEND_MAX_NEW_ROWS = 5          # 전송 확인 시 읽는 최근 행 수
+
+# 로그 (터미널/파일 쓰기는 별도 스레드에서, 매크로 루프는 큐에 넣기만 함)
+LOG_LEVEL = "INFO"             # 터미널 출력 최소 레벨 (DEBUG/INFO/WARNING/ERROR, 며칠씩 돌릴 땐 WARNING 권장)
+LOG_FILE = ""                  # 로그 파일 (빈 문자열 = 파일 기록 안 함)
+LOG_FILE_LEVEL = "INFO"        # 로그 파일 최소 레벨
+LOG_FILE_MAX_BYTES = 10_000_000  # 로그 파일이 이 크기를 넘으면 회전
+LOG_FILE_BACKUPS = 5           # 보관할 회전 파일 수 (enhance.log.1 ~ .5)
+LOG_QUEUE_SIZE = 10_000        # 출력 대기 줄 수 상한 (가득 차면 버림 - 터미널이 멈춰도 전송은 안 막힘)
+LOG_FLUSH_INTERVAL = 0.05      # 쌓인 로그를 모아서 출력하는 주기 (초)
 
 # 전역 상태
 stop_requested = False
 use_ax_api = AX_AVAILABLE  # AX API 사용 여부 (실패 시 자동 OCR fallback)
 
-# AX API 캐시 (매 루프마다 PID/앱 재생성 방지)
+# AX API 캐시 (매 루프마다 PID/앱 재생성 방지, 여러 채팅방이 공유)
 _ax_app = None
 _ax_pid = None
+_ax_pid_checked_at = 0.0
+_ax_lock = threading.Lock()
+AX_PID_CHECK_INTERVAL = 2.0    # pgrep 재확인 주기 (초)
+AX_ERROR_INVALID_ELEMENT = -25202  # kAXErrorInvalidUIElement (창이 닫혀 핸들이 무효)
+WINDOW_MATCH_THRESHOLD = 0.6   # 채팅방 이름 제안 최소 유사도 (0~1, 대화형 입력에서 완전 일치/포함이 없을 때)
 
 # OCR 리더 (lazy 초기화, fallback용)
 reader = None
@@ -61,23 +133,143 @@ def get_reader():
     return reader
 
 
+# ============================================================
+# 로그 (비동기 출력)
+# ============================================================
+logger = logging.getLogger("enhance_macro")
+_log_listener = None
+_log_handler = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """큐가 가득 차면 기다리지 않고 버리는 QueueHandler. 버린 줄 수는 dropped.
+    레코드 복사/포맷(기본 prepare)은 하지 않고 리스너 스레드의 핸들러에 맡긴다.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogListener:
+    """큐에 쌓인 로그 레코드를 LOG_FLUSH_INTERVAL마다 모아서 처리하는 스레드.
+    logging.handlers.QueueListener와 같은 역할이지만 줄마다 깨어나지 않으므로
+    매크로 루프/전송 스레드와 GIL을 주고받는 횟수가 줄어든다.
+    """
+
+    def __init__(self, log_queue, *handlers, interval=None):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.interval = LOG_FLUSH_INTERVAL if interval is None else interval
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """남은 레코드를 모두 처리한 뒤 스레드 종료."""
+        self._stopping.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+def _level(name):
+    level = logging.getLevelName(str(name).upper())
+    if not isinstance(level, int):
+        raise ValueError(f"알 수 없는 로그 레벨: {name}")
+    return level
+
+
+def start_logging(level=None, log_file=None):
+    """logger 출력을 큐 + 리스너 스레드로 구성. 이미 시작돼 있으면 False.
+    호출 스레드(이벤트 루프/전송 스레드)는 큐에 넣기만 하고, 터미널/파일 쓰기는 리스너 스레드가 한다.
+    """
+    global _log_listener, _log_handler
+    if _log_listener is not None:
+        return False
+    log_file = LOG_FILE if log_file is None else log_file
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(_level(level or LOG_LEVEL))
+    console.setFormatter(logging.Formatter("%(message)s"))
+    handlers = [console]
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+        file_handler.setLevel(_level(LOG_FILE_LEVEL))
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        handlers.append(file_handler)
+    _log_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    logger.addHandler(_log_handler)
+    logger.setLevel(min(handler.level for handler in handlers))
+    logger.propagate = False
+    _log_listener = LogListener(_log_handler.queue, *handlers)
+    _log_listener.start()
+    return True
+
+
+def stop_logging():
+    """큐에 남은 로그를 모두 출력하고 리스너 스레드를 멈춘다."""
+    global _log_listener, _log_handler
+    if _log_listener is None:
+        return
+    _log_listener.stop()
+    logger.removeHandler(_log_handler)
+    for handler in _log_listener.handlers:
+        handler.close()
+    if _log_handler.dropped:
+        print(f"[로그] 출력이 밀려 {_log_handler.dropped:,}줄을 버렸습니다 (LOG_QUEUE_SIZE={LOG_QUEUE_SIZE:,})")
+    _log_listener = _log_handler = None
+
+
 # ============================================================
 # AX API 텍스트 읽기
 # ============================================================
 def _get_ax_app():
-    """카카오톡 AX 앱 요소를 캐싱하여 반환."""
-    global _ax_app, _ax_pid
-    result = subprocess.run(['pgrep', '-x', 'KakaoTalk'], capture_output=True, text=True)
-    pid_str = result.stdout.strip()
-    if not pid_str:
-        _ax_app = None
-        _ax_pid = None
-        return None
-    pid = int(pid_str.split('\n')[0])
-    if pid != _ax_pid:
-        _ax_app = AX.AXUIElementCreateApplication(pid)
-        _ax_pid = pid
-    return _ax_app
+    """카카오톡 AX 앱 요소를 캐싱하여 반환.
+    pgrep은 AX_PID_CHECK_INTERVAL마다만 실행하며, 여러 스레드가 같은 핸들을 공유한다.
+    """
+    global _ax_app, _ax_pid, _ax_pid_checked_at
+    with _ax_lock:
+        now = time.monotonic()
+        if _ax_app is not None and now - _ax_pid_checked_at < AX_PID_CHECK_INTERVAL:
+            return _ax_app
+        result = subprocess.run(['pgrep', '-x', 'KakaoTalk'], capture_output=True, text=True)
+        _ax_pid_checked_at = now
+        pid_str = result.stdout.strip()
+        if not pid_str:
+            _ax_app = None
+            _ax_pid = None
+            return None
+        pid = int(pid_str.split('\n')[0])
+        if pid != _ax_pid:
+            _ax_app = AX.AXUIElementCreateApplication(pid)
+            _ax_pid = pid
+        return _ax_app
 
 
 def _ax_get(element, attr):
@@ -102,31 +294,262 @@ def _ax_extract_texts(element, texts, depth=0, max_depth=5):
             _ax_extract_texts(child, texts, depth + 1, max_depth)
 
 
-def _ax_find_chat_table(app, room_name):
-    """채팅방의 AXTable 요소를 찾아 반환."""
-    windows = _ax_get(app, "AXWindows")
-    if not windows:
+def _ax_find_chat_table(win):
+    """채팅방 창의 AXTable 요소(ScrollArea > Table)를 찾아 반환."""
+    children = _ax_get(win, "AXChildren")
+    if not children:
         return None
-    safe_name = room_name
-    for win in windows:
-        win_title = _ax_get(win, "AXTitle") or ""
-        if safe_name in str(win_title):
-            children = _ax_get(win, "AXChildren")
-            if not children:
-                continue
-            for child in children:
-                role = _ax_get(child, "AXRole") or ""
-                if "ScrollArea" not in str(role):
-                    continue
-                scroll_children = _ax_get(child, "AXChildren")
-                if not scroll_children:
-                    continue
-                for sc in scroll_children:
-                    if "Table" in str(_ax_get(sc, "AXRole") or ""):
-                        return sc
+    for child in children:
+        role = _ax_get(child, "AXRole") or ""
+        if "ScrollArea" not in str(role):
+            continue
+        scroll_children = _ax_get(child, "AXChildren")
+        if not scroll_children:
+            continue
+        for sc in scroll_children:
+            if "Table" in str(_ax_get(sc, "AXRole") or ""):
+                return sc
+    return None
+
+
+def _ax_find_input_field(win):
+    """채팅방 창의 입력 텍스트 필드를 찾아 반환.
+    AppleScript의 'UI element 1 of UI element 11 of w'와 동일 위치를 우선 사용하고,
+    구조가 다르면 텍스트 영역을 가진 마지막 ScrollArea를 찾는다.
+    """
+    children = _ax_get(win, "AXChildren")
+    if not children:
+        return None
+    candidates = []
+    if len(children) > 10:
+        candidates.append(children[10])
+    candidates.extend(reversed(children))
+    for child in candidates:
+        if "ScrollArea" not in str(_ax_get(child, "AXRole") or ""):
+            continue
+        scroll_children = _ax_get(child, "AXChildren")
+        if not scroll_children:
+            continue
+        role = str(_ax_get(scroll_children[0], "AXRole") or "")
+        if "TextArea" in role or "TextField" in role:
+            return scroll_children[0]
     return None
 
 
+
+# ============================================================
+# 창 목록 캐시
+# ============================================================
+LIST_WINDOWS_SCRIPT = '''
+tell application "System Events"
+    tell process "KakaoTalk"
+        set AppleScript's text item delimiters to linefeed
+        return (name of every window) as text
+    end tell
+end tell
+'''
+
+
+def normalize_title(title):
+    """창 제목/채팅방 이름 비교용 정규화: 유니코드 정규화(NFKC) 후 대소문자·공백·기호 무시."""
+    text = unicodedata.normalize('NFKC', str(title)).casefold()
+    return ''.join(ch for ch in text if ch.isalnum())
+
+
+def match_title(room_name, titles, fuzzy=False, threshold=WINDOW_MATCH_THRESHOLD):
+    """채팅방 이름에 맞는 창 제목을 반환. 없거나 애매하면 None.
+    정규화 후 완전 일치 > 이름을 포함하는 제목이 하나뿐일 때 그 제목 순으로 고른다.
+    fuzzy=True면 그래도 없을 때 유사도 threshold 이상 중 최고를 고른다 ('강화방1' → '강화방2'처럼
+    다른 방이 걸릴 수 있으므로 사용자 확인을 받는 대화형 입력에서만 사용).
+    """
+    key = normalize_title(room_name)
+    if not key:
+        return None
+    if room_name in titles:
+        return room_name
+    normalized = [(normalize_title(title), title) for title in titles]
+    exact = [title for norm, title in normalized if norm == key]
+    if exact:
+        return exact[0] if len(exact) == 1 else None
+    contained = [title for norm, title in normalized if key in norm]
+    if len(contained) == 1:
+        return contained[0]
+    if not fuzzy:
+        return None
+    best, best_ratio = None, threshold
+    matcher = difflib.SequenceMatcher(b=key, autojunk=False)
+    for norm, title in normalized:
+        if not norm:
+            continue
+        matcher.set_seq1(norm)
+        ratio = matcher.ratio()
+        if ratio >= best_ratio:
+            best, best_ratio = title, ratio
+    return best
+
+
+class WindowRegistry:
+    """카카오톡 창 목록을 한 번만 열거해 두고 채팅방 이름 → 창 제목/AX 핸들을 캐시.
+
+    창 목록은 창이 열리거나 닫힐 때(AXObserver 알림), 캐시한 핸들이 무효로 확인될 때,
+    카카오톡이 재시작됐을 때, 찾는 채팅방이 목록에 없을 때만 다시 읽는다.
+    AX 모드가 아니면 AppleScript로 창 이름 목록만 한 번 읽어 같은 방식으로 매칭한다.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._app = None
+        self._windows = None        # [(창 제목, AX 창 요소 또는 None)], None = 다시 읽어야 함
+        self._resolved = {}         # 채팅방 이름 -> 창 제목
+        self._handles = {}          # 창 제목 -> {'window', 'table', 'field'}
+        self._observer = None
+        self._loop = None
+        self.enumerations = 0       # 창 목록을 실제로 읽은 횟수 (진단/벤치마크용)
+
+    def invalidate(self):
+        with self._lock:
+            self._windows = None
+            self._resolved.clear()
+            self._handles.clear()
+
+    def _current_app(self):
+        """AX 모드면 앱 요소, 아니면 None. 앱이 바뀌었으면 (재시작) 캐시를 비우고 알림을 다시 등록."""
+        app = _get_ax_app() if use_ax_api else None
+        if app is not self._app:
+            self.invalidate()
+            self._app = app
+            self._watch(app)
+        return app
+
+    def _watch(self, app):
+        """창 열림/닫힘 알림을 받을 AXObserver를 전용 런루프 스레드에 등록.
+        등록할 수 없는 환경에서는 무효 핸들 감지와 목록 미스 시 재열거만으로 동작한다.
+        """
+        if self._loop is not None:
+            CoreFoundation.CFRunLoopStop(self._loop)
+        self._observer = self._loop = None
+        if app is None or not AX_OBSERVER_AVAILABLE:
+            return
+        try:
+            err, observer = AX.AXObserverCreate(_ax_pid, self._on_notification, None)
+            if err != 0:
+                return
+            AX.AXObserverAddNotification(observer, app, "AXWindowCreated", None)
+        except Exception as e:
+            logger.warning(f"[창 감시] AXObserver 등록 실패, 알림 없이 동작: {e}")
+            return
+        ready = threading.Event()
+
+        def _run():
+            self._loop = CoreFoundation.CFRunLoopGetCurrent()
+            CoreFoundation.CFRunLoopAddSource(self._loop, AX.AXObserverGetRunLoopSource(observer),
+                                              CoreFoundation.kCFRunLoopDefaultMode)
+            ready.set()
+            CoreFoundation.CFRunLoopRun()
+
+        self._observer = observer
+        threading.Thread(target=_run, name="window-observer", daemon=True).start()
+        ready.wait(1.0)
+
+    def _on_notification(self, observer, element, notification, refcon):
+        self.invalidate()
+
+    def _entries(self):
+        if self._windows is not None:
+            return self._windows
+        self.enumerations += 1
+        if self._app is None:
+            names = run_applescript(LIST_WINDOWS_SCRIPT)
+            entries = [(name, None) for name in names.split('\n') if name] if names else []
+        else:
+            entries = []
+            for win in _ax_get(self._app, "AXWindows") or ():
+                title = _ax_get(win, "AXTitle")
+                if not title:
+                    continue
+                entries.append((str(title), win))
+                self._handles.setdefault(str(title), {'window': win})
+                if self._observer is not None:
+                    AX.AXObserverAddNotification(self._observer, win, "AXUIElementDestroyed", None)
+        self._windows = entries
+        return entries
+
+    def titles(self):
+        with self._lock:
+            self._current_app()
+            return [title for title, _ in self._entries()]
+
+    def resolve(self, room_name):
+        """채팅방 이름 → 실제 창 제목 (완전 일치 또는 유일한 포함 일치만, 유사도 매칭 없음).
+        캐시된 목록에 없으면 한 번 새로 읽어 확인."""
+        with self._lock:
+            self._current_app()
+            title = self._resolved.get(room_name)
+            if title is not None:
+                return title
+            fresh = self._windows is None
+            title = match_title(room_name, [t for t, _ in self._entries()])
+            if title is None and not fresh:
+                self.invalidate()   # 새로 열린 창일 수 있음
+                title = match_title(room_name, [t for t, _ in self._entries()])
+            if title is not None:
+                self._resolved[room_name] = title
+            return title
+
+    def handle(self, room_name, kind='window'):
+        """캐시된 AX 핸들 ('window' / 'table' / 'field'). AX 모드가 아니거나 못 찾으면 None."""
+        with self._lock:
+            title = self.resolve(room_name)
+            handles = self._handles.get(title) if title is not None else None
+            if handles is None:
+                return None
+            element = handles.get(kind)
+            if element is None:
+                find = _ax_find_chat_table if kind == 'table' else _ax_find_input_field
+                element = find(handles['window'])
+                if element is not None:     # 못 찾으면 (창 로딩 중) 다음 호출에서 다시 찾는다
+                    handles[kind] = element
+            return element
+
+    def read(self, room_name, kind, attr):
+        """캐시된 핸들의 속성 읽기. 핸들이 무효(창이 닫힘)면 목록을 다시 읽고 한 번 재시도."""
+        for _ in range(2):
+            element = self.handle(room_name, kind)
+            if element is None:
+                return None
+            err, value = AX.AXUIElementCopyAttributeValue(element, attr, None)
+            if err == 0:
+                return value
+            if err != AX_ERROR_INVALID_ELEMENT:
+                return None
+            self.invalidate()
+        return None
+
+
+WINDOWS = WindowRegistry()
+
+
+
+def read_chat_rows_ax(room_name, last_n=5):
+    """AX API로 마지막 N개 행을 행 단위 텍스트로 읽기.
+
+    Returns:
+        (int, list[list[str]]): (전체 행 수, 행별 텍스트 리스트)
+        None이면 AX API 실패
+    """
+    with METRICS.span('ax_read'):
+        rows = WINDOWS.read(room_name, 'table', "AXRows")
+        if not rows:
+            return None
+        target_rows = rows[-last_n:] if len(rows) >= last_n else rows
+        row_texts = []
+        for row in target_rows:
+            texts = []
+            _ax_extract_texts(row, texts)
+            row_texts.append(texts)
+        return len(rows), row_texts
+
+
 def read_chat_text_ax(room_name, last_n=5):
     """AX API로 채팅 텍스트를 직접 읽어 리스트로 반환.
 
@@ -138,20 +561,183 @@ def read_chat_text_ax(room_name, last_n=5):
         list[str]: 텍스트 리스트 (read_chat_text와 호환)
         None이면 AX API 실패
     """
-    app = _get_ax_app()
-    if app is None:
+    result = read_chat_rows_ax(room_name, last_n)
+    if result is None:
         return None
-    table = _ax_find_chat_table(app, room_name)
-    if table is None:
+    return [t for row in result[1] for t in row]
+
+
+# ============================================================
+# AX API 명령어 전송
+# ============================================================
+RETURN_KEY_CODE = 36
+
+
+def wait_until(condition, timeout, poll_interval=SEND_POLL_INTERVAL,
+               clock=time.monotonic, sleep=time.sleep):
+    """condition()이 참이 될 때까지 최대 timeout초 대기. 충족 여부 반환."""
+    deadline = clock() + timeout
+    while True:
+        if condition():
+            return True
+        if clock() >= deadline:
+            return False
+        sleep(poll_interval)
+
+
+class AXInputBackend:
+    """AX API로 입력창에 값을 넣고 Quartz로 Enter 키를 직접 전송하는 백엔드.
+
+    DirectSender가 사용하는 최소 인터페이스(prepare/set_input/input_value/
+    popup_signature/press_return)만 구현하므로, 같은 메서드를 가진
+    가짜 백엔드로 교체해 전송 타이밍을 검증할 수 있다.
+    """
+
+    def __init__(self, room_name):
+        self.room_name = room_name
+        self.pid = None
+        self.window = None
+        self.field = None
+
+    def prepare(self):
+        """창을 앞으로 가져오고 입력창에 포커스. 실패 시 False."""
+        for _ in range(2):
+            app = _get_ax_app()
+            win = WINDOWS.handle(self.room_name)
+            field = WINDOWS.handle(self.room_name, 'field')
+            if app is None or win is None or field is None:
+                return False
+            self.pid, self.window, self.field = _ax_pid, win, field
+            AX.AXUIElementSetAttributeValue(app, "AXFrontmost", True)
+            if AX.AXUIElementPerformAction(win, "AXRaise") != AX_ERROR_INVALID_ELEMENT:
+                AX.AXUIElementSetAttributeValue(field, "AXFocused", True)
+                return True
+            WINDOWS.invalidate()   # 창이 닫혔다 다시 열림 -> 새 핸들로 재시도
+        return False
+
+    def set_input(self, text):
+        AX.AXUIElementSetAttributeValue(self.field, "AXValue", text)
+
+    def input_value(self):
+        value = _ax_get(self.field, "AXValue")
+        return value if isinstance(value, str) else ""
+
+    def popup_signature(self):
+        """자동완성 팝업 감지용 (앱 창 수, 채팅창 자식 수). 팝업이 뜨면 값이 바뀐다."""
+        app = _get_ax_app()
+        windows = _ax_get(app, "AXWindows") if app is not None else None
+        children = _ax_get(self.window, "AXChildren")
+        return (len(windows) if windows else 0, len(children) if children else 0)
+
+    def press_return(self):
+        for key_down in (True, False):
+            event = Quartz.CGEventCreateKeyboardEvent(None, RETURN_KEY_CODE, key_down)
+            Quartz.CGEventPostToPid(self.pid, event)
+
+
+class DirectSender:
+    """고정 딜레이 대신 관찰 가능한 조건을 기다리며 명령어를 전송.
+
+    1단계: 값 입력 -> 자동완성 팝업 표시 대기 -> Enter (명령어 선택)
+    2단계: 팝업 닫힘 대기 -> Enter (전송) -> 입력창 비워짐 대기
+    각 대기는 SEND_*_TIMEOUT을 상한으로 하며, 조건을 못 보면 상한 후 그대로 진행한다.
+    """
+
+    def __init__(self, backend, clock=time.monotonic, sleep=time.sleep,
+                 poll_interval=SEND_POLL_INTERVAL):
+        self.backend = backend
+        self.clock = clock
+        self.sleep = sleep
+        self.poll_interval = poll_interval
+
+    def wait_for(self, condition, timeout):
+        return wait_until(condition, timeout, self.poll_interval, self.clock, self.sleep)
+
+    def send(self, command):
+        """명령어 전송. 백엔드 준비 실패 시 None, 입력창이 비워졌으면 True."""
+        backend = self.backend
+        if not backend.prepare():
+            return None
+        baseline = backend.popup_signature()
+        backend.set_input(command)
+        self.wait_for(lambda: backend.popup_signature() != baseline, SEND_POPUP_TIMEOUT)
+        backend.press_return()
+        self.wait_for(lambda: backend.popup_signature() == baseline, SEND_SELECT_TIMEOUT)
+        backend.press_return()
+        return self.wait_for(lambda: not backend.input_value(), SEND_CLEAR_TIMEOUT)
+
+
+_ax_senders = {}
+
+
+def send_command_ax(command, room_name):
+    """AX API로 명령어를 직접 전송.
+
+    Returns:
+        True: 전송 완료 (입력창 비워짐 확인)
+        False: 전송했으나 입력창 비워짐 미확인
+        None: AX 전송 불가 (AppleScript fallback 필요)
+    """
+    if not (AX_AVAILABLE and KEY_EVENT_AVAILABLE):
         return None
-    rows = _ax_get(table, "AXRows")
-    if not rows:
+    sender = _ax_senders.get(room_name)
+    if sender is None:
+        sender = _ax_senders[room_name] = DirectSender(AXInputBackend(room_name))
+    return sender.send(command)
+
+
+def _chat_marker_ax(room_name):
+    """전송 확인 기준점: (전체 행 수, 마지막 행 텍스트). AX 실패 시 None."""
+    result = read_chat_rows_ax(room_name, last_n=1)
+    if result is None:
         return None
-    target_rows = rows[-last_n:] if len(rows) >= last_n else rows
-    texts = []
-    for row in target_rows:
-        _ax_extract_texts(row, texts)
-    return texts
+    count, rows = result
+    return count, rows[-1] if rows else []
+
+
+def confirm_sent_ax(command, room_name, marker, timeout=SEND_CONFIRM_TIMEOUT):
+    """전송 후 내 명령어 행(또는 그 뒤의 봇 응답)이 나타났는지 확인.
+
+    행 수가 늘었으면 새 행 중 명령어가 있는지 보고, 행 수가 그대로면
+    (채팅 테이블 행 제한) 마지막 행 내용이 바뀌었는지로 판단한다.
+    """
+    before_count, before_last = marker
+
+    def _appeared():
+        result = read_chat_rows_ax(room_name, last_n=SEND_MAX_NEW_ROWS)
+        if result is None:
+            return False
+        count, rows = result
+        if count > before_count:
+            new_rows = rows[-(count - before_count):]
+            return any(command in row for row in new_rows)
+        return bool(rows) and rows[-1] != before_last
+
+    return wait_until(_appeared, timeout, poll_interval=SEND_CONFIRM_POLL)
+
+
+def send_command_confirmed(command, room_name, stats=None):
+    """명령어 전송 후 짧게 확인하고, 안 보이면 SEND_MAX_RETRIES까지 즉시 재전송.
+
+    AX 모드가 아니면 확인할 수단이 없으므로 한 번만 전송하고 True를 반환한다.
+    Returns:
+        bool: 전송 확인 여부
+    """
+    for attempt in range(SEND_MAX_RETRIES + 1):
+        marker = _chat_marker_ax(room_name) if use_ax_api else None
+        send_command(command, room_name)
+        if marker is None:
+            return True
+        if confirm_sent_ax(command, room_name, marker):
+            return True
+        if attempt < SEND_MAX_RETRIES:
+            logger.warning(f"[재전송] 전송 미확인 ({attempt + 1}/{SEND_MAX_RETRIES})")
+            if stats is not None:
+                stats.record_send_retry()
+    logger.error("[전송 실패] 재전송 후에도 명령어가 확인되지 않음")
+    if stats is not None:
+        stats.record_send_drop()
+    return False
 
 
 def escape_applescript(s):
@@ -162,74 +748,366 @@ def escape_applescript(s):
 # ============================================================
 # 통계 클래스
 # ============================================================
-class EnhanceStats:
-    def __init__(self, filename=STATS_FILE):
-        self.filename = filename
-        self.data = self.load()
+def atomic_write(path, text):
+    """임시 파일에 쓰고 교체 (저장 중 중단돼도 이전 내용이 남도록)."""
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def is_socket(path):
+    """path가 유닉스 소켓 파일이면 True (일반 파일/디렉터리/없음이면 False, 심볼릭 링크는 따라가지 않음)."""
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
 
-    def load(self):
-        if os.path.exists(self.filename):
+
+def wilson_interval(successes, total, z=1.96):
+    """성공률의 Wilson 신뢰구간 (기본 95%). total이 0이면 (0.0, 1.0)."""
+    if total <= 0:
+        return 0.0, 1.0
+    p = successes / total
+    denom = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denom
+    half = z * ((p * (1 - p) / total + z * z / (4 * total * total)) ** 0.5) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class StatsStore:
+    """여러 매크로 프로세스가 함께 쓰는 통계 저장소 (SQLite WAL 모드).
+
+    시도 1건마다 attempts 테이블에 한 행을 추가하고, 같은 트랜잭션에서 레벨별 집계
+    (level_stats), 시간대별 집계(hourly_stats)와 전체 카운터(counters)를 갱신한다.
+    WAL 모드라 집계 읽기가 쓰기를 막지 않고, 쓰기끼리는 SQLite 잠금으로 직렬화되어
+    프로세스가 여러 개여도 시도가 유실되지 않는다.
+
+    조회는 모두 인덱스나 집계 테이블만 읽는다: 레벨별 최근 N회는 (level, id) 인덱스,
+    기간/시간대별 성공률은 hourly_stats (시간당 채팅방·레벨별 한 행)를 합산한다.
+    """
+
+    COUNTERS = ("total_attempts", "total_destroys", "max_level_reached", "send_retries", "send_drops")
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()   # 한 프로세스 안에서 스레드 간 연결 공유
+        self.conn = sqlite3.connect(path, timeout=STATS_DB_TIMEOUT, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.transaction() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS attempts (
+                id INTEGER PRIMARY KEY, ts REAL NOT NULL, room TEXT, level INTEGER NOT NULL,
+                result TEXT NOT NULL, to_level INTEGER, gold INTEGER, source TEXT, session TEXT)""")
+            if "session" not in [row[1] for row in db.execute("PRAGMA table_info(attempts)")]:
+                db.execute("ALTER TABLE attempts ADD COLUMN session TEXT")
+            db.execute("CREATE INDEX IF NOT EXISTS attempts_level ON attempts (level, id, result)")
+            db.execute("CREATE INDEX IF NOT EXISTS attempts_ts ON attempts (ts)")
+            db.execute("CREATE INDEX IF NOT EXISTS attempts_room ON attempts (room, id)")
+            db.execute("""CREATE TABLE IF NOT EXISTS hourly_stats (
+                hour INTEGER NOT NULL, room TEXT NOT NULL DEFAULT '', level INTEGER NOT NULL,
+                success INTEGER NOT NULL DEFAULT 0, fail INTEGER NOT NULL DEFAULT 0,
+                keep INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (hour, room, level))""")
+            if not db.execute("SELECT 1 FROM hourly_stats LIMIT 1").fetchone():
+                # 이전 버전 DB: 기존 시도 기록으로 시간대별 집계를 한 번 채운다
+                db.execute("""INSERT INTO hourly_stats (hour, room, level, success, fail, keep)
+                    SELECT CAST(ts / 3600 AS INTEGER), COALESCE(room, ''), level,
+                           SUM(result = 'success'), SUM(result = 'fail'), SUM(result = 'keep')
+                    FROM attempts GROUP BY 1, 2, 3""")
+            db.execute("""CREATE TABLE IF NOT EXISTS level_stats (
+                level INTEGER PRIMARY KEY, success INTEGER NOT NULL DEFAULT 0,
+                fail INTEGER NOT NULL DEFAULT 0, keep INTEGER NOT NULL DEFAULT 0)""")
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.executemany("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                           [(name,) for name in self.COUNTERS])
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ~ COMMIT (예외 시 ROLLBACK)."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
             try:
-                with open(self.filename, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                print(f"[경고] 통계 파일 로드 실패: {e}")
-                pass
-        return {
-            "level_stats": {},
-            "total_attempts": 0,
-            "total_destroys": 0,
-            "max_level_reached": 0
-        }
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    @staticmethod
+    def _apply(db, attempts, counters):
+        if attempts:
+            db.executemany("INSERT INTO attempts (ts, room, level, result, to_level, gold, source, session) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           [a if len(a) == 8 else (*a, None) for a in attempts])
+            per_level = {}
+            per_hour = {}
+            for ts, room, level, result, *_ in attempts:
+                column = ('success', 'fail', 'keep').index(result)
+                per_level.setdefault(level, [0, 0, 0])[column] += 1
+                per_hour.setdefault((int(ts // 3600), room or '', level), [0, 0, 0])[column] += 1
+            db.executemany("INSERT INTO level_stats (level, success, fail, keep) VALUES (?, ?, ?, ?) "
+                           "ON CONFLICT(level) DO UPDATE SET success = success + excluded.success, "
+                           "fail = fail + excluded.fail, keep = keep + excluded.keep",
+                           [(level, *row) for level, row in per_level.items()])
+            db.executemany("INSERT INTO hourly_stats (hour, room, level, success, fail, keep) "
+                           "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(hour, room, level) DO UPDATE SET "
+                           "success = success + excluded.success, fail = fail + excluded.fail, "
+                           "keep = keep + excluded.keep",
+                           [(*key, *row) for key, row in per_hour.items()])
+            counters = dict(counters)
+            counters["total_attempts"] = counters.get("total_attempts", 0) + len(attempts)
+            counters["total_destroys"] = counters.get("total_destroys", 0) + sum(
+                row[1] for row in per_level.values())
+            max_level = max((a[4] for a in attempts if a[4] is not None), default=None)
+            if max_level is not None:
+                db.execute("UPDATE counters SET value = MAX(value, ?) WHERE name = 'max_level_reached'",
+                           (max_level,))
+        db.executemany("UPDATE counters SET value = value + ? WHERE name = ?",
+                       [(value, name) for name, value in counters.items() if value])
+
+    def record(self, attempts, counters=None, meta=None):
+        """시도 행 (ts, room, level, result, to_level, gold, source[, session])들과 카운터 증가분을 한 트랜잭션으로 기록.
+        result는 'success' | 'fail' | 'keep'. meta(dict)는 같은 트랜잭션에서 meta 테이블에 저장 (가져오기 진행 위치 등).
+        """
+        with self.transaction() as db:
+            self._apply(db, attempts, counters or {})
+            if meta:
+                db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               [(key, str(value)) for key, value in meta.items()])
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def snapshot(self):
+        """합산 집계를 기존 JSON 통계와 같은 형태의 dict로 반환 (쓰기를 막지 않음)."""
+        with self._lock:
+            levels = self.conn.execute("SELECT level, success, fail, keep FROM level_stats").fetchall()
+            counters = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+        data = {"level_stats": {str(level): {"success": s, "fail": f, "keep": k} for level, s, f, k in levels}}
+        data.update((name, counters.get(name, 0)) for name in self.COUNTERS)
+        return data
+
+    @staticmethod
+    def _rate_row(success, fail, keep):
+        total = success + fail + keep
+        low, high = wilson_interval(success, total)
+        return {"success": success, "fail": fail, "keep": keep, "total": total,
+                "rate": success / total if total else None, "ci": (low, high)}
+
+    def level_rates(self, level=None, last_n=None, since=None, room=None):
+        """레벨별 성공률과 95% 신뢰구간. {레벨: {success, fail, keep, total, rate, ci}}.
+
+        last_n: 레벨마다 최근 N회만 (attempts 인덱스), since: 이 시각(epoch 초) 이후만
+        (시간 단위로 내림, hourly_stats), 둘 다 없으면 전체 누적 (level_stats).
+        room은 last_n/since 조회에만 적용된다.
+        """
+        with self._lock:
+            if last_n is not None:
+                levels = [level] if level is not None else [row[0] for row in self.conn.execute(
+                    "SELECT level FROM level_stats ORDER BY level")]
+                rows = []
+                for lvl in levels:
+                    query = ("SELECT SUM(result = 'success'), SUM(result = 'fail'), SUM(result = 'keep') "
+                             "FROM (SELECT result FROM attempts WHERE level = ?")
+                    args = [lvl]
+                    if room is not None:
+                        query += " AND room = ?"
+                        args.append(room)
+                    query += " ORDER BY id DESC LIMIT ?)"
+                    success, fail, keep = self.conn.execute(query, (*args, last_n)).fetchone()
+                    if success is not None:
+                        rows.append((lvl, success, fail, keep))
+            elif since is not None or room is not None:
+                query = "SELECT level, SUM(success), SUM(fail), SUM(keep) FROM hourly_stats WHERE hour >= ?"
+                args = [int((since or 0) // 3600)]
+                if room is not None:
+                    query += " AND room = ?"
+                    args.append(room)
+                if level is not None:
+                    query += " AND level = ?"
+                    args.append(level)
+                rows = self.conn.execute(query + " GROUP BY level ORDER BY level", args).fetchall()
+            else:
+                query = "SELECT level, success, fail, keep FROM level_stats"
+                args = ()
+                if level is not None:
+                    query += " WHERE level = ?"
+                    args = (level,)
+                rows = self.conn.execute(query + " ORDER BY level", args).fetchall()
+        return {lvl: self._rate_row(s, f, k) for lvl, s, f, k in rows}
+
+    def gold_costs(self, last_n=5000):
+        """최근 last_n회 시도에서 레벨별 시도당 평균 골드 소모 (같은 채팅방의 직전 시도 골드와의 차이)."""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT level, AVG(prev_gold - gold) FROM (
+                    SELECT level, gold, LAG(gold) OVER (PARTITION BY room ORDER BY id) AS prev_gold
+                    FROM (SELECT id, room, level, gold FROM attempts WHERE gold IS NOT NULL
+                          ORDER BY id DESC LIMIT ?))
+                WHERE prev_gold > gold GROUP BY level""", (last_n,)).fetchall()
+        return {level: cost for level, cost in rows}
+
+    def hour_of_day_rates(self, level=None, since=None, room=None):
+        """시간대(현지 0~23시)별 성공률. {시: {success, fail, keep, total, rate, ci}}."""
+        query = "SELECT hour, SUM(success), SUM(fail), SUM(keep) FROM hourly_stats WHERE hour >= ?"
+        args = [int((since or 0) // 3600)]
+        if level is not None:
+            query += " AND level = ?"
+            args.append(level)
+        if room is not None:
+            query += " AND room = ?"
+            args.append(room)
+        with self._lock:
+            rows = self.conn.execute(query + " GROUP BY hour", args).fetchall()
+        by_hour = {}
+        for hour, s, f, k in rows:
+            bucket = by_hour.setdefault(time.localtime(hour * 3600).tm_hour, [0, 0, 0])
+            bucket[0] += s
+            bucket[1] += f
+            bucket[2] += k
+        return {hour: self._rate_row(*by_hour[hour]) for hour in sorted(by_hour)}
+
+    def import_json(self, path):
+        """기존 enhance_stats.json 집계를 한 번만 가져온다 (프로세스 여러 개가 동시에 열어도 1회)."""
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"[경고] 기존 통계 파일 로드 실패: {e}")
+            return False
+        key = "legacy_import:" + os.path.abspath(path)
+        with self.transaction() as db:
+            if db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return False
+            db.executemany("INSERT INTO level_stats (level, success, fail, keep) VALUES (?, ?, ?, ?) "
+                           "ON CONFLICT(level) DO UPDATE SET success = success + excluded.success, "
+                           "fail = fail + excluded.fail, keep = keep + excluded.keep",
+                           [(int(level), s.get("success", 0), s.get("fail", 0), s.get("keep", 0))
+                            for level, s in legacy.get("level_stats", {}).items()])
+            db.executemany("UPDATE counters SET value = value + ? WHERE name = ?",
+                           [(legacy.get(name, 0), name) for name in self.COUNTERS if name != "max_level_reached"])
+            db.execute("UPDATE counters SET value = MAX(value, ?) WHERE name = 'max_level_reached'",
+                       (legacy.get("max_level_reached", 0),))
+            db.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(time.time())))
+        print(f"  기존 통계 가져옴: {path} -> {self.path}")
+        return True
+
+    def reset(self):
+        with self.transaction() as db:
+            db.execute("DELETE FROM attempts")
+            db.execute("DELETE FROM level_stats")
+            db.execute("DELETE FROM hourly_stats")
+            db.execute("UPDATE counters SET value = 0")
+
+
+class EnhanceStats:
+    """StatsStore 위의 통계 인터페이스. 기록은 모아 두었다가 한 트랜잭션으로 저장하고,
+    data는 다른 프로세스 기록까지 합산한 현재 집계를 반환한다.
+    filename이 None이면 메모리 DB (트레이스 재생 등 파일 없이 집계).
+    """
+
+    def __init__(self, filename=STATS_FILE, legacy_file=LEGACY_STATS_FILE):
+        self.filename = filename
+        self.store = StatsStore(filename or ":memory:")
+        if filename:
+            self.store.import_json(legacy_file)
+        self.autosave = True   # False면 기록 시 dirty만 표시 (엔진의 저장 태스크가 flush)
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_counters = {}
+        self.session_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"  # 이번 실행의 시도 묶음
+
+    @property
+    def data(self):
+        self.flush()
+        return self.store.snapshot()
 
     def save(self):
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
-
-    def _ensure_level(self, level_key):
-        if level_key not in self.data["level_stats"]:
-            self.data["level_stats"][level_key] = {"success": 0, "fail": 0, "keep": 0}
-        elif "keep" not in self.data["level_stats"][level_key]:
-            self.data["level_stats"][level_key]["keep"] = 0
-
-    def record_success(self, from_level, to_level):
-        level_key = str(from_level)
-        self._ensure_level(level_key)
-        self.data["level_stats"][level_key]["success"] += 1
-        self.data["total_attempts"] += 1
-        if to_level > self.data["max_level_reached"]:
-            self.data["max_level_reached"] = to_level
-        self.save()
-
-    def record_destroy(self, at_level):
-        level_key = str(at_level)
-        self._ensure_level(level_key)
-        self.data["level_stats"][level_key]["fail"] += 1
-        self.data["total_attempts"] += 1
-        self.data["total_destroys"] += 1
-        self.save()
-
-    def record_keep(self, at_level):
-        level_key = str(at_level)
-        self._ensure_level(level_key)
-        self.data["level_stats"][level_key]["keep"] += 1
-        self.data["total_attempts"] += 1
-        self.save()
-
-    def get_success_rate(self, level):
+        self.write(self.serialize())
+
+    def serialize(self):
+        """저장 대기 중인 기록을 꺼낸다 (엔진 루프 스레드에서 호출, write는 다른 스레드 가능)."""
+        with self._lock:
+            batch = (self._pending, self._pending_counters)
+            self._pending, self._pending_counters = [], {}
+            self.dirty = False
+        return batch
+
+    def write(self, batch):
+        attempts, counters = batch
+        if not attempts and not counters:
+            return
+        try:
+            self.store.record(attempts, counters)
+        except sqlite3.Error as e:
+            # DB 잠금 대기 초과 등: 기록을 되돌려 다음 저장 때 다시 시도 (시도 유실 방지)
+            logger.warning(f"[경고] 통계 저장 실패, 다음 주기에 재시도: {e}")
+            with self._lock:
+                self._pending[:0] = attempts
+                for name, value in counters.items():
+                    self._pending_counters[name] = self._pending_counters.get(name, 0) + value
+                self.dirty = True
+
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    def _changed(self):
+        if self.autosave:
+            self.save()
+        else:
+            self.dirty = True
+
+    def _record(self, level, result, to_level=None, room=None, gold=None):
+        with self._lock:
+            self._pending.append((time.time(), room, level, result, to_level, gold, 'live', self.session_id))
+        self._changed()
+
+    def _count(self, name):
+        with self._lock:
+            self._pending_counters[name] = self._pending_counters.get(name, 0) + 1
+        self._changed()
+
+    def record_success(self, from_level, to_level, room=None, gold=None):
+        self._record(from_level, 'success', to_level, room, gold)
+
+    def record_destroy(self, at_level, room=None, gold=None):
+        self._record(at_level, 'fail', 0, room, gold)
+
+    def record_keep(self, at_level, room=None, gold=None):
+        self._record(at_level, 'keep', at_level, room, gold)
+
+    def record_send_retry(self):
+        self._count("send_retries")
+
+    def record_send_drop(self):
+        self._count("send_drops")
+
+    def get_success_rate(self, level, data=None):
+        level_stats = (data or self.data)["level_stats"]
         level_key = str(level)
-        if level_key not in self.data["level_stats"]:
+        if level_key not in level_stats:
             return None
-        stats = self.data["level_stats"][level_key]
+        stats = level_stats[level_key]
         total = stats["success"] + stats["fail"] + stats.get("keep", 0)
         return stats["success"] / total if total > 0 else None
 
     def simulate_to_20(self, simulations=10000):
-        if not self.data["level_stats"]:
+        data = self.data
+        if not data["level_stats"]:
             return None, None
         probabilities = {}
         for level in range(20):
-            rate = self.get_success_rate(level)
+            rate = self.get_success_rate(level, data)
             probabilities[level] = rate if rate else max(0.1, 1.0 - (level * 0.04))
 
         successes = 0
@@ -255,22 +1133,31 @@ class EnhanceStats:
         print("\n" + "=" * 55)
         print("  강화 통계")
         print("=" * 55)
-        print(f"  총 시도: {self.data['total_attempts']}")
-        print(f"  총 파괴: {self.data['total_destroys']}")
-        print(f"  최고 레벨: +{self.data['max_level_reached']}")
-
-        if self.data["level_stats"]:
-            print("\n  [레벨별 성공률]")
+        data = self.data
+        print(f"  총 시도: {data['total_attempts']}")
+        print(f"  총 파괴: {data['total_destroys']}")
+        print(f"  최고 레벨: +{data['max_level_reached']}")
+        print(f"  재전송: {data['send_retries']}회 (전송 실패 {data['send_drops']}회)")
+
+        if data["level_stats"]:
+            # 누적 집계(level_stats)와 레벨별 최근 N회(인덱스 조회)만 읽는다
+            rates = self.store.level_rates()
+            recent = self.store.level_rates(last_n=STATS_RECENT_WINDOW)
+            print(f"\n  [레벨별 성공률] (괄호: 95% 신뢰구간, 최근: 마지막 {STATS_RECENT_WINDOW}회)")
             print("  " + "-" * 51)
             for level in range(20):
-                key = str(level)
-                if key in self.data["level_stats"]:
-                    s = self.data["level_stats"][key]
-                    keep = s.get("keep", 0)
-                    total = s["success"] + s["fail"] + keep
-                    rate = (s["success"] / total * 100) if total > 0 else 0
+                if level in rates:
+                    s = rates[level]
+                    keep, total = s["keep"], s["total"]
+                    rate = (s["rate"] or 0) * 100
                     bar = "#" * int(rate/5) + "-" * (20 - int(rate/5))
-                    print(f"  +{level:2d}->+{level+1:2d}: [{bar}] {rate:5.1f}% ({s['success']}/{total}, 유지{keep}, 파괴{s['fail']})")
+                    low, high = s["ci"]
+                    line = (f"  +{level:2d}->+{level+1:2d}: [{bar}] {rate:5.1f}% ({s['success']}/{total}, "
+                            f"유지{keep}, 파괴{s['fail']}) [{low*100:.1f}~{high*100:.1f}%]")
+                    last = recent.get(level)
+                    if last is not None and last["total"] < total:
+                        line += f" 최근 {last['rate'] * 100:.1f}%"
+                    print(line)
 
             print("\n  [+20 도달 예측]")
             sr, avg = self.simulate_to_20()
@@ -279,8 +1166,8 @@ class EnhanceStats:
         print("=" * 55 + "\n")
 
     def reset(self):
-        self.data = {"level_stats": {}, "total_attempts": 0, "total_destroys": 0, "max_level_reached": 0}
-        self.save()
+        self.serialize()   # 저장 대기 중인 기록도 버림
+        self.store.reset()
         print("  통계 초기화 완료\n")
 
 
@@ -292,68 +1179,66 @@ def run_applescript(script):
         result = subprocess.run(['osascript', '-e', script], capture_output=True, text=True)
         return result.stdout.strip()
     except subprocess.SubprocessError as e:
-        print(f"[오류] AppleScript 실행 실패: {e}")
+        logger.error(f"[오류] AppleScript 실행 실패: {e}")
         return None
 
 
+def _applescript_on_window(room_name, make_script):
+    """채팅방 창을 이름으로 직접 지정하는 AppleScript 실행 (창 목록 순회 없음).
+    결과가 비면 (창이 닫혔거나 이름이 바뀜) 창 목록을 다시 읽고 한 번 재시도한다.
+    """
+    for _ in range(2):
+        title = WINDOWS.resolve(room_name)
+        if title is None:
+            return None
+        result = run_applescript(make_script(escape_applescript(title)))
+        if result:
+            return result
+        WINDOWS.invalidate()
+    return None
+
+
 def find_kakao_window(room_name):
-    safe_name = escape_applescript(room_name)
-    script = f'''
-    tell application "System Events"
-        tell process "KakaoTalk"
-            set winNames to name of every window
-            repeat with wName in winNames
-                if wName contains "{safe_name}" then
-                    return wName as text
-                end if
-            end repeat
-        end tell
-    end tell
-    return ""
-    '''
-    result = run_applescript(script)
-    return result if result else None
+    """채팅방 이름에 해당하는 실제 창 제목 (완전 일치 또는 유일한 포함 일치). 없으면 None."""
+    return WINDOWS.resolve(room_name)
+
+
+def choose_kakao_window(room_name):
+    """대화형 입력용: 바로 찾지 못하면 가장 비슷한 창 제목을 제안하고 확인을 받는다. 없으면 None."""
+    title = find_kakao_window(room_name)
+    if title is not None:
+        return title
+    suggestion = match_title(room_name, WINDOWS.titles(), fuzzy=True)
+    if suggestion is None:
+        return None
+    answer = input(f"  -> '{room_name}' 창이 없습니다. '{suggestion}' 창이 맞나요? (y/n): ")
+    return suggestion if answer.strip().lower() == 'y' else None
 
 
 def activate_kakao_window(room_name):
-    safe_name = escape_applescript(room_name)
-    script = f'''
+    _applescript_on_window(room_name, lambda title: f'''
     tell application "System Events"
         tell process "KakaoTalk"
             set frontmost to true
-            set wins to every window
-            repeat with w in wins
-                if name of w contains "{safe_name}" then
-                    perform action "AXRaise" of w
-                    return true
-                end if
-            end repeat
+            perform action "AXRaise" of window "{title}"
+            return true
         end tell
     end tell
-    return false
-    '''
-    run_applescript(script)
+    ''')
     time.sleep(0.15)
 
 
 def get_window_bounds(room_name):
-    safe_name = escape_applescript(room_name)
-    script = f'''
+    result = _applescript_on_window(room_name, lambda title: f'''
     tell application "System Events"
         tell process "KakaoTalk"
-            set wins to every window
-            repeat with w in wins
-                if name of w contains "{safe_name}" then
-                    set pos to position of w
-                    set sz to size of w
-                    return (item 1 of pos as string) & "," & (item 2 of pos as string) & "," & (item 1 of sz as string) & "," & (item 2 of sz as string)
-                end if
-            end repeat
+            set w to window "{title}"
+            set pos to position of w
+            set sz to size of w
+            return (item 1 of pos as string) & "," & (item 2 of pos as string) & "," & (item 1 of sz as string) & "," & (item 2 of sz as string)
         end tell
     end tell
-    return ""
-    '''
-    result = run_applescript(script)
+    ''')
     if result:
         try:
             parts = result.split(',')
@@ -388,36 +1273,39 @@ def read_chat_text(screenshot):
 
 def send_command(command, room_name):
     """
-    명령어 전송 - 자동완성 팝업 대기 후 2단계 엔터
+    명령어 전송 - AX API 직접 전송 우선, 불가 시 AppleScript fallback
+    """
+    if use_ax_api and send_command_ax(command, room_name) is not None:
+        return
+    send_command_applescript(command, room_name)
+
+
+def send_command_applescript(command, room_name):
+    """
+    AppleScript 명령어 전송 - 자동완성 팝업 대기 후 2단계 엔터
     1단계: 텍스트 입력 -> 딜레이 -> Enter (자동완성에서 명령어 선택)
     2단계: 다시 딜레이 -> Enter (전송)
     """
-    safe_name = escape_applescript(room_name)
     safe_command = escape_applescript(command)
-    script = f'''
+    _applescript_on_window(room_name, lambda title: f'''
     tell application "System Events"
         tell process "KakaoTalk"
             set frontmost to true
-            set wins to every window
-            repeat with w in wins
-                if name of w contains "{safe_name}" then
-                    perform action "AXRaise" of w
-                    delay 0.05
-                    set inputScroll to UI element 11 of w
-                    set tf to UI element 1 of inputScroll
-                    set value of tf to "{safe_command}"
-                    set focused of tf to true
-                    delay 0.25
-                    key code 36
-                    delay 0.1
-                    key code 36
-                    exit repeat
-                end if
-            end repeat
+            set w to window "{title}"
+            perform action "AXRaise" of w
+            delay 0.05
+            set inputScroll to UI element 11 of w
+            set tf to UI element 1 of inputScroll
+            set value of tf to "{safe_command}"
+            set focused of tf to true
+            delay 0.25
+            key code 36
+            delay 0.1
+            key code 36
+            return true
         end tell
     end tell
-    '''
-    run_applescript(script)
+    ''')
 
 
 def parse_level_change(texts):
@@ -432,10 +1320,10 @@ def parse_level_change(texts):
         if match:
             from_lvl, to_lvl = int(match.group(1)), int(match.group(2))
             if to_lvl > MAX_LEVEL or from_lvl > MAX_LEVEL:
-                print(f"[OCR 보정] 레벨 범위 초과 무시: +{from_lvl} -> +{to_lvl} (최대 +{MAX_LEVEL})")
+                logger.info(f"[OCR 보정] 레벨 범위 초과 무시: +{from_lvl} -> +{to_lvl} (최대 +{MAX_LEVEL})")
                 continue
             if to_lvl != from_lvl + 1:
-                print(f"[OCR 보정] 1단위 증가 아님 무시: +{from_lvl} -> +{to_lvl}")
+                logger.info(f"[OCR 보정] 1단위 증가 아님 무시: +{from_lvl} -> +{to_lvl}")
                 continue
             return from_lvl, to_lvl
     if '강화에 성공' in combined or '성공하셨습니다' in combined:
@@ -443,7 +1331,7 @@ def parse_level_change(texts):
         if match:
             to_lvl = int(match.group(1))
             if to_lvl > MAX_LEVEL:
-                print(f"[OCR 보정] 레벨 범위 초과 무시: [+{to_lvl}] (최대 +{MAX_LEVEL})")
+                logger.info(f"[OCR 보정] 레벨 범위 초과 무시: [+{to_lvl}] (최대 +{MAX_LEVEL})")
                 return None, None
             return to_lvl - 1, to_lvl
     return None, None
@@ -468,7 +1356,7 @@ def scan_current_level(texts, current_level=None):
                 last_to = val
     if last_to is not None:
         if current_level is not None and abs(last_to - current_level) > 3:
-            print(f"[동기화 무시] 화살표 패턴 +{last_to} (현재 +{current_level}에서 ±3 초과, 오인식 의심)")
+            logger.info(f"[동기화 무시] 화살표 패턴 +{last_to} (현재 +{current_level}에서 ±3 초과, 오인식 의심)")
             return None
         return last_to
     matches = re.findall(r'\[\+(\d+)\]', combined)
@@ -477,7 +1365,7 @@ def scan_current_level(texts, current_level=None):
         if current_level is not None:
             candidates = [v for v in candidates if abs(v - current_level) <= 3]
             if not candidates:
-                print(f"[동기화 무시] '[+N]' 패턴 모두 ±3 초과 (현재 +{current_level}, 오인식 의심)")
+                logger.info(f"[동기화 무시] '[+N]' 패턴 모두 ±3 초과 (현재 +{current_level}, 오인식 의심)")
                 return None
         if not candidates:
             return None
@@ -485,6 +1373,24 @@ def scan_current_level(texts, current_level=None):
     return None
 
 
+def find_level_in_history(rows):
+    """채팅 행들(오래된 순)을 최신 행부터 거꾸로 읽어 마지막 강화 결과의 레벨을 반환.
+    파괴는 0, 성공은 도달 레벨, 유지는 '[+N]'. 근거가 없으면 None.
+    """
+    for row in reversed(rows):
+        text = ' '.join(row)
+        if FAIL_TEXT in text:
+            return 0
+        _, to_lvl = parse_level_change([text])
+        if to_lvl is not None:
+            return to_lvl
+        if KEEP_TEXT in text:
+            match = re.search(r'\[\+(\d+)\]', text)
+            if match and int(match.group(1)) <= MAX_LEVEL:
+                return int(match.group(1))
+    return None
+
+
 def parse_remaining_gold(texts):
     """OCR 텍스트에서 '남은 골드: NNN,NNNG' 패턴을 찾아 정수 반환.
     못 찾으면 None 반환.
@@ -500,10 +1406,197 @@ def parse_remaining_gold(texts):
             pass
     return None
 
+# ============================================================
+# OCR 퍼지 매칭
+# ============================================================
+# 문자 단위 OCR 혼동 보정 (전각/유사 기호 -> 표준 기호)
+_OCR_CHAR_TABLE = str.maketrans({
+    '＋': '+', '十': '+', '✚': '+',
+    '➔': '→', '➜': '→', '➝': '→', '⟶': '→', '▶': '→', '▷': '→', '►': '→', '〉': '→', '»': '→',
+    '［': '[', '〔': '[', '「': '[', '(': '[', '{': '[',
+    '］': ']', '〕': ']', '」': ']', ')': ']', '}': ']',
+    '：': ':', ';': ':',
+    '—': '-', '–': '-', '一': '-', 'ー': '-',
+    **{chr(0xFF10 + d): str(d) for d in range(10)},
+})
+_OCR_ARROW_RE = re.compile(r'-\s*>|=\s*>|-\s*→|>')
+_OCR_PLUS_RE = re.compile(r'(?:(?<=[\s\[→])|^)[tT]\s*(?=[0-9OoDlI|i!SsBZ])')
+_OCR_NUMBER_RE = re.compile(r'\+\s*([0-9OoDlI|i!SsBZ]{1,2})(?![0-9A-Za-z])')
+_OCR_DIGIT_TABLE = str.maketrans('OoDlI|i!SsBZ', '000111115582')
+_FUZZY_ARROW_RE = re.compile(r'\+\s*(\d{1,2})\s*→\s*\+\s*(\d{1,2})')
+_FUZZY_BRACKET_RE = re.compile(r'\[\s*\+\s*(\d{1,2})\s*\]')
+_FUZZY_GOLD_NUMBER_RE = re.compile(r'\s*:?\s*([0-9OoDlI|][0-9OoDlI|,.\s]*)[GgC6]')
+
+# OCR이 자주 혼동하는 한글 음절 쌍 (치환 비용 절반)
+OCR_SYLLABLE_CONFUSIONS = [
+    ('괴', '괘'), ('괴', '궤'), ('괴', '과'), ('화', '와'), ('화', '하'), ('강', '감'),
+    ('성', '섬'), ('공', '곰'), ('파', '퍼'), ('유', '우'), ('지', '치'), ('레', '래'),
+    ('벨', '밸'), ('었', '였'), ('습', '슴'), ('되', '돼'), ('은', '온'), ('골', '굴'),
+]
+
+
+def normalize_ocr_text(text):
+    """OCR 텍스트의 기호/숫자 혼동을 표준 형태로 보정."""
+    text = text.translate(_OCR_CHAR_TABLE)
+    text = _OCR_ARROW_RE.sub('→', text)
+    text = _OCR_PLUS_RE.sub('+', text)
+    return _OCR_NUMBER_RE.sub(lambda m: '+' + m.group(1).translate(_OCR_DIGIT_TABLE), text)
+
+
+class FuzzyMatcher:
+    """OCR 오인식에 강한 봇 메시지 판정기.
+
+    키워드는 미리 등록해 두고, 텍스트 안에서 가장 가까운 부분 문자열과의
+    편집 거리(혼동 음절 치환 0.5, 공백 삽입/삭제 0.25, 그 외 1)를 계산한다.
+    결과마다 0~1 신뢰도를 함께 반환하여 호출 측이 채택 여부를 정한다.
+    """
+
+    def __init__(self, confusions=OCR_SYLLABLE_CONFUSIONS, max_error_ratio=0.34):
+        self.max_error_ratio = max_error_ratio
+        self._confusable = set()
+        for a, b in confusions:
+            self._confusable.add((a, b))
+            self._confusable.add((b, a))
+        self.keywords = {
+            'success': [SUCCESS_TEXT, '강화 성공', '성공하셨습니다'],
+            'destroy': [FAIL_TEXT],
+            'keep': [KEEP_TEXT],
+            'gold': ['남은 골드'],
+        }
+
+    def _sub_cost(self, a, b):
+        if a == b:
+            return 0.0
+        if (a, b) in self._confusable:
+            return 0.5
+        return 1.0
+
+    def search(self, pattern, text):
+        """text 안에서 pattern과 가장 가까운 부분 문자열의 (편집 거리, 끝 위치)."""
+        prev = [0.0] * (len(text) + 1)   # 첫 행 0: 어느 위치에서든 매칭 시작 가능
+        for i, pc in enumerate(pattern, 1):
+            gap = 0.25 if pc == ' ' else 1.0
+            cur = [prev[0] + gap]
+            for j, tc in enumerate(text, 1):
+                insert = 0.25 if tc == ' ' else 1.0
+                cur.append(min(prev[j - 1] + self._sub_cost(pc, tc),
+                               prev[j] + gap,
+                               cur[j - 1] + insert))
+            prev = cur
+        best = min(range(len(prev)), key=prev.__getitem__)
+        return prev[best], best
+
+    def keyword_confidence(self, kind, text):
+        """kind 키워드 중 가장 잘 맞는 것의 (신뢰도, 끝 위치). 허용 오차 초과 시 (0.0, -1)."""
+        best = (0.0, -1)
+        for keyword in self.keywords[kind]:
+            if keyword in text:
+                return 1.0, text.index(keyword) + len(keyword)
+            dist, end = self.search(keyword, text)
+            if dist <= len(keyword) * self.max_error_ratio:
+                conf = 1.0 - dist / len(keyword)
+                if conf > best[0]:
+                    best = (conf, end)
+        return best
+
+    @staticmethod
+    def _levels(text):
+        for m in _FUZZY_ARROW_RE.finditer(text):
+            from_lvl, to_lvl = int(m.group(1)), int(m.group(2))
+            if from_lvl <= MAX_LEVEL and to_lvl == from_lvl + 1:
+                return from_lvl, to_lvl
+        return None, None
+
+    def classify(self, texts, current_level=None):
+        """새 메시지 판정. (result, from_lvl, to_lvl, confidence) 반환.
+        판정 불가면 ('unknown', None, None, 0.0).
+        """
+        if not texts:
+            return 'waiting', None, None, 0.0
+        text = normalize_ocr_text(' '.join(texts))
+        from_lvl, to_lvl = self._levels(text)
+        brackets = [int(x) for x in _FUZZY_BRACKET_RE.findall(text) if int(x) <= MAX_LEVEL]
+        candidates = []
+
+        conf, _ = self.keyword_confidence('success', text)
+        if from_lvl is not None:
+            # '+N → +N+1' 자체가 성공 근거. 현재 레벨과 맞고 키워드도 비슷하면 가산
+            consistent = current_level in (None, from_lvl)
+            arrow_conf = 0.85 if consistent else 0.6
+            if conf:
+                arrow_conf = max(arrow_conf, min(1.0, conf * (1.0 if consistent else 0.8) + 0.15))
+            candidates.append(('success', from_lvl, to_lvl, arrow_conf))
+        elif conf and current_level is not None:
+            candidates.append(('success', current_level, current_level + 1, conf * 0.9))
+        conf, _ = self.keyword_confidence('destroy', text)
+        if conf:
+            level_conf = 1.0 if 0 in brackets else 0.9
+            candidates.append(('destroy', from_lvl, None, conf * level_conf))
+        conf, _ = self.keyword_confidence('keep', text)
+        if conf:
+            level_conf = 1.0 if current_level is None or current_level in brackets else 0.9
+            candidates.append(('keep', None, None, conf * level_conf))
+        if not candidates and 0 in brackets and current_level:
+            candidates.append(('destroy', None, None, 0.8))
+        if not candidates:
+            return 'unknown', None, None, 0.0
+        return max(candidates, key=lambda c: c[3])
+
+    def parse_gold(self, texts):
+        """'남은 골드' 금액 퍼지 파싱. (골드, 신뢰도), 못 찾으면 (None, 0.0)."""
+        text = normalize_ocr_text(' '.join(texts))
+        conf, end = self.keyword_confidence('gold', text)
+        if not conf:
+            return None, 0.0
+        match = _FUZZY_GOLD_NUMBER_RE.match(text, end)
+        if not match:
+            return None, 0.0
+        digits = re.sub(r'[^0-9]', '', match.group(1).translate(_OCR_DIGIT_TABLE))
+        if not digits:
+            return None, 0.0
+        return int(digits), conf
+
+
+OCR_MATCHER = FuzzyMatcher()
+
+
+def parse_cooldown(texts):
+    """봇의 쿨다운/과속 응답을 찾아 대기 시간(초)을 반환.
+    숫자가 없으면 0.0, 쿨다운 응답이 아니면 None.
+    """
+    combined = ' '.join(texts)
+    for pattern in COOLDOWN_PATTERNS:
+        match = re.search(pattern, combined)
+        if match:
+            return float(match.group(1)) if match.groups() else 0.0
+    return None
+
+
 def check_response(texts, last_texts, current_level=None):
-    """새로운 메시지만 확인"""
+    """새로운 메시지만 확인 (last_texts에 없던 텍스트를 새 메시지로 간주)"""
     # 새 메시지 추출 (이전에 없던 것)
     new_texts = [t for t in texts if t not in last_texts]
+    return classify_response(new_texts, texts, current_level)
+
+
+def _command_index(texts):
+    """마지막 내 명령어 행의 위치 (없으면 -1)."""
+    for i in range(len(texts) - 1, -1, -1):
+        if texts[i].strip() == COMMAND:
+            return i
+    return -1
+
+
+def bot_reply_texts(new_texts):
+    """새 메시지 중 봇 응답으로 볼 부분: 마지막 명령어 행 뒤 (명령어 행 자체는 빼고)."""
+    return new_texts[_command_index(new_texts) + 1:]
+
+
+def classify_response(new_texts, texts, current_level=None):
+    """새 메시지(new_texts)로 결과 판정. texts는 레벨 파싱 재시도용 화면 전체 텍스트.
+    내 명령어 행만 새로 보인 상태는 아직 응답 전('waiting')이다.
+    """
+    new_texts = bot_reply_texts(new_texts)
     if not new_texts:
         return 'waiting', None, None
     combined = ' '.join(new_texts)
@@ -526,15 +1619,1332 @@ def check_response(texts, last_texts, current_level=None):
         return 'destroy', from_lvl, None
     if from_lvl is not None and to_lvl is not None and to_lvl > from_lvl:
         return 'success', from_lvl, to_lvl
-    # new_texts에서 레벨 파싱 실패 시 전체 texts에서 재시도
-    from_lvl2, to_lvl2 = parse_level_change(texts)
-    if from_lvl2 is not None and to_lvl2 is not None and to_lvl2 > from_lvl2:
-        return 'success', from_lvl2, to_lvl2
+    # 결과 없이 쿨다운 응답만 온 경우: 이번 전송은 처리되지 않음
+    if parse_cooldown(new_texts) is not None:
+        return 'cooldown', None, None
+    # new_texts에서 레벨 파싱 실패 시 화면의 내 명령어 뒤에서만 재시도
+    # (명령어 앞에는 이전 시도의 '+N → +N+1' 응답이 남아 있어 거짓 성공이 된다)
+    index = _command_index(texts)
+    if index >= 0:
+        from_lvl2, to_lvl2 = parse_level_change(texts[index + 1:])
+        if from_lvl2 is not None and to_lvl2 is not None and to_lvl2 > from_lvl2:
+            return 'success', from_lvl2, to_lvl2
     return 'unknown', None, None
 
+# ============================================================
+# 성능 계측
+# ============================================================
+METRICS_ENABLED = False        # 구간별 소요 시간 계측 (False면 오버헤드 거의 없음)
+METRICS_FILE = ""              # Prometheus 텍스트 형식으로 주기 저장할 파일 (빈 문자열 = 저장 안 함)
+METRICS_PORT = 0               # 127.0.0.1:PORT/metrics 로 노출 (0 = 비활성화)
+METRICS_EXPORT_INTERVAL = 5.0  # 파일 저장 주기 (초)
+METRICS_PHASES = ('window_check', 'pre_read', 'send', 'reply_wait', 'ax_read', 'parse', 'stats_save')
+
+
+class _NullSpan:
+    """계측 비활성화 시 쓰는 공유 no-op 컨텍스트."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """고정 로그 스케일 버킷 히스토그램 (0.5ms ~ 약 20초, 25% 간격).
+    메모리가 일정하고 백분위수는 버킷 안에서 선형 보간한다.
+    """
+
+    BOUNDS = tuple(0.0005 * 1.25 ** i for i in range(48))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.BOUNDS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = self.BOUNDS[index - 1] if index > 0 else 0.0
+                high = self.BOUNDS[index] if index < len(self.BOUNDS) else self.BOUNDS[-1] * 1.25
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return self.BOUNDS[-1]
+
+
+class Metrics:
+    """구간(span)별 소요 시간 집계와 내보내기.
+
+    with METRICS.span('send'): ... 형태로 사용하며, 비활성화 상태에서는
+    시계를 읽지 않는 공유 no-op 객체를 돌려준다.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, Histogram())
+        return hist
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self.histogram(name))
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self.histogram(name).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    def summary(self):
+        """구간별 (횟수, p50, p95, p99, 평균) 초 단위 딕셔너리."""
+        result = {}
+        for name, hist in sorted(self.histograms.items()):
+            if hist.count:
+                result[name] = (hist.count, hist.quantile(0.5), hist.quantile(0.95),
+                                hist.quantile(0.99), hist.total / hist.count)
+        return result
+
+    def format_summary(self):
+        lines = ["[구간별 소요 시간] (ms)",
+                 f"  {'구간':<12}{'횟수':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'평균':>7}"]
+        for name, (count, p50, p95, p99, mean) in self.summary().items():
+            lines.append(f"  {name:<14}{count:>8}{p50 * 1000:>9.1f}{p95 * 1000:>9.1f}"
+                         f"{p99 * 1000:>9.1f}{mean * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        """Prometheus 텍스트 노출 형식."""
+        lines = ["# HELP enhance_phase_seconds Time spent per macro phase.",
+                 "# TYPE enhance_phase_seconds histogram"]
+        for name, hist in sorted(self.histograms.items()):
+            with hist._lock:
+                counts = list(hist.counts)
+                count, total = hist.count, hist.total
+            cumulative = 0
+            for bound, n in zip(hist.BOUNDS, counts):
+                cumulative += n
+                lines.append(f'enhance_phase_seconds_bucket{{phase="{name}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'enhance_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {count}')
+            lines.append(f'enhance_phase_seconds_sum{{phase="{name}"}} {total:.6f}')
+            lines.append(f'enhance_phase_seconds_count{{phase="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path):
+        """임시 파일에 쓰고 교체 (읽는 쪽이 반쯤 쓴 파일을 보지 않도록)."""
+        atomic_write(path, self.prometheus_text())
+
+    def serve(self, port):
+        """127.0.0.1:port/metrics HTTP 엔드포인트를 데몬 스레드로 시작. 서버 반환."""
+        metrics = self
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200 if self.path.startswith('/metrics') else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+METRICS = Metrics(enabled=METRICS_ENABLED)
+
+
+# ============================================================
+# 정지 정책 (목표 도달 확률표)
+# ============================================================
+POLICY_MIN_PROB = 0.0          # 남은 골드로 목표 도달 확률이 이 값 미만이면 정지 (0 = 비활성화, 예: 0.05)
+POLICY_MAX_BUCKETS = 20000     # 골드 구간 수 상한 (이보다 많은 골드는 판단 보류 - 도달 확률을 계산하지 않음)
+POLICY_COST_ERROR = 0.05       # 구간 단위로 반올림한 시도 비용의 허용 상대 오차
+POLICY_COST_DIVISORS = 10      # 구간 폭 후보: 최소 비용 / 1..N (N이면 어떤 비용이든 오차 허용치 이내)
+POLICY_REFRESH_ATTEMPTS = 50   # N회 시도마다 성공률을 다시 읽음 (바뀐 경우에만 재계산)
+POLICY_MIN_SAMPLES = 30        # 레벨별 시도가 이보다 적으면 기본 성공률 사용
+POLICY_RATE_EPSILON = 0.002    # 이보다 작은 성공률 변화는 재계산하지 않음
+POLICY_COST_ALPHA = 0.1        # 시도당 골드 소모 EMA 계수
+
+
+class PolicyTable:
+    """(레벨, 골드 구간)별 '남은 골드로 목표 레벨에 도달할 확률' 표.
+
+    레벨별 성공/파괴/유지 확률과 시도당 골드 소모로 동적 계획법을 푼다:
+        P(L, b) = p·P(L+1, b-c) + d·P(0, b-c) + k·P(L, b-c)   (c = L에서 시도 1회 비용, 구간 단위)
+    각 행은 더 적은 골드 구간만 참조하므로 골드 구간 순서로 한 번 훑으면 된다.
+    구간 폭은 모든 레벨의 비용을 POLICY_COST_ERROR 이내로 나타낼 수 있는 가장 넓은 폭이며
+    (예: 1000G/1499G면 500G), 골드가 POLICY_MAX_BUCKETS 구간을 넘으면 폭을 넓혀 비용을
+    부풀리는 대신 확률을 None(판단 보류)으로 둔다.
+    표는 필요한 골드 구간까지만 만들고(골드는 줄어들기만 하므로 대부분 재사용),
+    성공률/비용이 의미 있게 바뀌었을 때만 다시 계산한다. 조회는 O(1).
+    """
+
+    def __init__(self):
+        self.rates = {}            # 레벨 -> (성공, 파괴, 유지) 확률
+        self.costs = {}            # 레벨 -> 시도당 골드 소모 (EMA)
+        self._tables = {}          # 목표 레벨 -> (구간 폭, 행 리스트)
+        self.compute_time = 0.0    # 마지막 계산 소요 시간 (초)
+
+    # ---------- 입력 ----------
+    def set_rates(self, level_rates):
+        """StatsStore.level_rates() 결과 반영. 표본이 적은 레벨은 기본 성공률."""
+        rates = {}
+        for level in range(MAX_LEVEL):
+            r = level_rates.get(level)
+            if r is not None and r["total"] >= POLICY_MIN_SAMPLES:
+                rates[level] = (r["success"] / r["total"], r["fail"] / r["total"], r["keep"] / r["total"])
+            else:
+                success = max(0.1, 1.0 - (level * 0.04))   # simulate_to_20과 같은 기본값
+                rates[level] = (success, 0.0, 1.0 - success)
+        changed = any(abs(a - b) > POLICY_RATE_EPSILON
+                      for level in rates for a, b in zip(rates[level], self.rates.get(level, (2, 2, 2))))
+        if changed:
+            self.rates = rates
+            self._tables.clear()
+        return changed
+
+    def set_costs(self, costs):
+        if costs:
+            self.costs.update(costs)
+            self._tables.clear()
+
+    def observe_cost(self, level, cost):
+        """시도 1회의 골드 소모 관찰. 구간 수가 달라질 만큼 바뀌면 표를 버린다."""
+        old = self.costs.get(level)
+        new = cost if old is None else old + POLICY_COST_ALPHA * (cost - old)
+        self.costs[level] = new
+        for bucket, _ in self._tables.values():
+            steps = self._steps(bucket, max(new, 1))
+            if old is None or steps is None or steps != self._steps(bucket, max(old, 1)):
+                self._tables.clear()
+                break
+
+    # ---------- 계산/조회 ----------
+    def _level_cost(self, level):
+        if level in self.costs:
+            return self.costs[level]
+        return sum(self.costs.values()) / len(self.costs)
+
+    @staticmethod
+    def _steps(bucket, cost):
+        """비용을 구간 수로 반올림. 오차가 POLICY_COST_ERROR를 넘으면 None."""
+        steps = max(1, round(cost / bucket))
+        if abs(steps * bucket - cost) > POLICY_COST_ERROR * cost:
+            return None
+        return steps
+
+    @classmethod
+    def bucket_width(cls, costs):
+        """모든 비용을 허용 오차 이내로 나타내는 가장 넓은 구간 폭 (최소 비용 / k 중 가장 큰 것)."""
+        smallest = max(min(costs), 1)
+        for k in range(1, POLICY_COST_DIVISORS + 1):
+            bucket = smallest / k
+            if all(cls._steps(bucket, max(cost, 1)) is not None for cost in costs):
+                return bucket
+        return smallest / POLICY_COST_DIVISORS
+
+    def _build(self, target, budget):
+        start = time.perf_counter()
+        bucket = self.bucket_width([self._level_cost(level) for level in range(target)])
+        rows = []
+        self._tables[target] = (bucket, rows)
+        self._extend(target, min(int(budget // bucket), POLICY_MAX_BUCKETS))
+        self.compute_time = time.perf_counter() - start
+
+    def _extend(self, target, last_bucket):
+        """rows[b][L] (L = 0..target, rows[b][target] = 1)를 last_bucket까지 채운다."""
+        bucket, rows = self._tables[target]
+        steps = [max(1, round(max(self._level_cost(level), 1) / bucket)) for level in range(target)]
+        rates = [self.rates[level] for level in range(target)]
+        for b in range(len(rows), last_bucket + 1):
+            row = [0.0] * (target + 1)
+            row[target] = 1.0
+            for level in range(target):
+                prev = b - steps[level]
+                if prev < 0:
+                    continue
+                p, d, k = rates[level]
+                before = rows[prev]
+                row[level] = p * before[level + 1] + d * before[0] + k * before[level]
+            rows.append(row)
+
+    def prob(self, level, budget, target):
+        """골드 budget으로 level에서 target까지 도달할 확률.
+        비용을 아직 모르거나 골드가 표 범위(POLICY_MAX_BUCKETS 구간)를 넘으면 None."""
+        if level >= target:
+            return 1.0
+        if budget <= 0:
+            return 0.0
+        if not self.costs or not self.rates:
+            return None
+        if target not in self._tables:
+            self._build(target, budget)
+        bucket, rows = self._tables[target]
+        b = int(budget // bucket)
+        if b > POLICY_MAX_BUCKETS:
+            return None
+        if b >= len(rows):
+            self._extend(target, b)
+        return rows[b][level]
+
+
+# ============================================================
+# 비동기 매크로 엔진
+# ============================================================
+READ_TIMEOUT = 2.0             # 창 확인/채팅 읽기 1회 데드라인 (초)
+SEND_TIMEOUT = 5.0             # 전송(확인/재전송 포함) 데드라인 (초)
+REPLY_TIMEOUT = 5.0            # 봇 응답 대기 상한 (초)
+REPLY_POLL_INTERVAL = 0.1      # 응답 폴링 주기 (초)
+STATS_FLUSH_INTERVAL = 1.0     # 통계 파일 저장 주기 (초, 변경 있을 때만)
+JOURNAL_SIZE = 200             # 채팅방별로 보관하는 최근 메시지 수
+
+# 전송 속도 조절 (봇 쿨다운 학습)
+GOVERNOR_START_INTERVAL = 0.0  # 초기 최소 전송 간격 (초, 0 = 제한 없음)
+GOVERNOR_BACKOFF = 1.5         # 쿨다운 응답 시 간격 배수
+GOVERNOR_STEP = 0.1            # 쿨다운 응답 시 최소 증가폭 (초)
+GOVERNOR_PROBE_AFTER = 20      # 쿨다운 없이 N회 연속 전송하면 간격을 줄여 한계 탐색
+GOVERNOR_PROBE_FACTOR = 0.9    # 탐색 시 간격 배수
+GOVERNOR_SAFETY_MARGIN = 1.1   # 쿨다운이 났던 간격 대비 탐색 하한 배수
+GOVERNOR_BURST = 1             # 토큰 버킷 용량 (연속 전송 허용 수)
+
+# 실행 중 제어 (Unix 소켓, JSON 한 줄 요청/응답)
+CONTROL_SOCKET = ""            # 소켓 경로 (빈 문자열 = 사용 안 함, 예: "/tmp/enhance_macro.sock")
+CONTROL_TIMEOUT = 5.0          # 클라이언트 응답 대기 (초)
+
+
+class ThroughputGovernor:
+    """봇 쿨다운을 학습해 전송 간격을 한계 바로 위에 맞추는 토큰 버킷.
+
+    쿨다운 응답이 오면 간격을 늘리고 그때의 실제 전송 간격을 '위험 간격'으로 기억한다.
+    쿨다운 없이 GOVERNOR_PROBE_AFTER회 연속 전송하면 위험 간격 * 안전 배수를
+    하한으로 간격을 줄여 최소 안전 간격을 찾아간다.
+    """
+
+    def __init__(self, clock=time.monotonic, interval=GOVERNOR_START_INTERVAL,
+                 burst=GOVERNOR_BURST):
+        self.clock = clock
+        self.interval = interval
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self.unsafe_gap = 0.0      # 쿨다운이 발생했던 가장 큰 전송 간격
+        self.last_sent = None
+        self.last_gap = None
+        self.clean_streak = 0
+        self.sends = 0
+        self.cooldowns = 0
+        self.started_at = None
+
+    def reserve(self):
+        """토큰 하나를 예약하고 전송 전까지 기다려야 할 시간(초)을 반환."""
+        now = self.clock()
+        start = max(now, self.blocked_until)
+        if self.interval <= 0:
+            self.tokens = float(self.burst)
+        else:
+            self.tokens = min(self.burst, self.tokens + (start - self.updated) / self.interval)
+            if self.tokens < 1:
+                start += (1 - self.tokens) * self.interval
+                self.tokens = 1.0
+        self.tokens -= 1
+        self.updated = start
+        return start - now
+
+    def on_sent(self):
+        now = self.clock()
+        if self.started_at is None:
+            self.started_at = now
+        if self.last_sent is not None:
+            self.last_gap = now - self.last_sent
+        self.last_sent = now
+        self.sends += 1
+
+    def on_reply(self):
+        """쿨다운 없이 처리된 전송."""
+        self.clean_streak += 1
+        if self.clean_streak >= GOVERNOR_PROBE_AFTER and self.interval > 0:
+            self.clean_streak = 0
+            floor = self.unsafe_gap * GOVERNOR_SAFETY_MARGIN
+            self.interval = max(self.interval * GOVERNOR_PROBE_FACTOR, floor)
+
+    def on_cooldown(self, wait_hint=None):
+        """쿨다운 응답: 간격을 늘리고, 봇이 대기 시간을 알려주면 그때까지 전송 금지."""
+        self.cooldowns += 1
+        self.clean_streak = 0
+        if self.last_gap is not None:
+            self.unsafe_gap = max(self.unsafe_gap, self.last_gap)
+        self.interval = max(self.interval * GOVERNOR_BACKOFF,
+                            self.interval + GOVERNOR_STEP,
+                            self.unsafe_gap * GOVERNOR_SAFETY_MARGIN)
+        if wait_hint:
+            self.blocked_until = self.clock() + wait_hint
+
+    def report(self):
+        """달성 전송 속도와 학습된 간격 기준 이론 속도 (회/분)."""
+        elapsed = self.clock() - self.started_at if self.started_at is not None else 0.0
+        achieved = self.sends / (elapsed / 60) if elapsed > 0 else 0.0
+        if self.interval > 0:
+            limit = f"{60 / self.interval:.1f}회/분 (간격 {self.interval:.2f}초)"
+        else:
+            limit = "제한 없음"
+        return f"[속도] 달성 {achieved:.1f}회/분, 봇 한계 {limit}, 쿨다운 {self.cooldowns}회"
+
+
+class MessageJournal:
+    """관찰한 채팅 메시지에 단조 증가 ID를 붙여 보관하는 링 버퍼.
+
+    AX 모드는 테이블 행 번호(전체 행 수)로 새 행을 식별하고, OCR 모드나
+    행 수가 늘지 않은 경우(테이블 행 제한)에는 직전 관찰의 꼬리와 이번 관찰의 머리가
+    겹치는 최대 구간을 맞춰 그 뒤만 새 메시지로 본다. 같은 봇 메시지가 반복되어도
+    새 행이면 새 메시지로 기록된다.
+    """
+
+    def __init__(self, maxlen=JOURNAL_SIZE):
+        self.entries = deque(maxlen=maxlen)   # 텍스트 (ID는 위치로 계산)
+        self.next_id = 0
+        self._row_count = None
+        self._last_obs = []
+
+    @property
+    def last_id(self):
+        """마지막 메시지 ID (아직 없으면 -1)."""
+        return self.next_id - 1
+
+    def since(self, msg_id):
+        """msg_id 이후의 메시지 텍스트 리스트 (새 메시지 수에 비례하는 비용)."""
+        count = min(self.next_id - 1 - msg_id, len(self.entries))
+        if count <= 0:
+            return []
+        texts = list(islice(reversed(self.entries), count))
+        texts.reverse()
+        return texts
+
+    def _append(self, texts):
+        self.entries.extend(texts)
+        self.next_id += len(texts)
+
+    @staticmethod
+    def _overlap(prev, obs):
+        """prev의 꼬리와 obs의 머리가 일치하는 최대 길이. 없으면 None."""
+        for k in range(min(len(prev), len(obs)), 0, -1):
+            if prev[len(prev) - k:] == obs[:k]:
+                return k
+        return None
+
+    def _new_by_alignment(self, obs):
+        k = self._overlap(self._last_obs, obs)
+        if k is not None:
+            return obs[k:]
+        if not self._last_obs:
+            return obs
+        # 겹침 없음 (OCR 오인식 등): 이전 관찰에 없던 것만 새 메시지로 (기존 방식)
+        return [t for t in obs if t not in self._last_obs]
+
+    def observe_texts(self, texts):
+        """OCR 등 행 구분 없는 관찰을 반영. 새로 추가된 텍스트 수 반환."""
+        new = self._new_by_alignment(texts)
+        self._last_obs = texts
+        self._append(new)
+        return len(new)
+
+    def observe_rows(self, row_count, rows):
+        """AX 행 단위 관찰 (전체 행 수, 마지막 행들의 텍스트)을 반영."""
+        prev_count = self._row_count
+        self._row_count = row_count
+        obs = rows   # 읽기마다 새로 만든 리스트이므로 복사하지 않고 그대로 보관
+        if prev_count is not None and row_count > prev_count and row_count - prev_count <= len(obs):
+            new_rows = obs[len(obs) - (row_count - prev_count):]
+        elif prev_count is None:
+            new_rows = []  # 첫 관찰은 기준점 (이미 화면에 있던 메시지)
+        else:
+            new_rows = self._new_by_alignment(obs)
+        self._last_obs = obs
+        texts = [t for row in new_rows for t in row]
+        self._append(texts)
+        return len(texts)
+
+
+class KakaoBackend:
+    """실제 카카오톡 창을 대상으로 하는 채팅 I/O 백엔드.
+    모든 메서드는 blocking이며 MacroEngine이 스레드에서 호출한다.
+    read_rows가 None을 반환하면 엔진은 read_texts(행 구분 없는 텍스트)를 사용한다.
+    """
+
+    def window_exists(self, room_name):
+        if use_ax_api:
+            return WINDOWS.read(room_name, 'window', "AXTitle") is not None
+        return get_window_bounds(room_name) is not None
+
+    def read_rows(self, room_name):
+        """AX 모드면 (전체 행 수, 행별 텍스트), 아니면 None (read_texts 사용)."""
+        if not use_ax_api:
+            return None
+        return read_chat_rows_ax(room_name, last_n=5)
+
+    def read_texts(self, room_name):
+        """현재 모드에 따라 채팅 텍스트를 읽기 (AX 실패 시 OCR fallback)."""
+        global use_ax_api
+        if use_ax_api:
+            result = read_chat_text_ax(room_name, last_n=5)
+            if result is not None:
+                return result
+            # AX API 실패 → OCR fallback
+            if not OCR_AVAILABLE:
+                return []
+            logger.warning("[AX API 실패] OCR fallback으로 전환")
+            use_ax_api = False
+        bounds = get_window_bounds(room_name)
+        return read_chat_text(capture_chat_area(bounds)) if bounds else []
+
+    def send(self, command, room_name, stats=None):
+        return send_command_confirmed(command, room_name, stats)
+
+
+class MacroSession:
+    """채팅방 하나의 매크로 진행 상태 (레벨, 골드, 마지막 텍스트, 세션 통계).
+    여러 채팅방을 돌릴 때는 채팅방마다 하나씩 만들어 MacroEngine.run에 넘긴다.
+    """
+
+    def __init__(self, room_name, current_level, target_level=None, gold_limit=None):
+        self.room_name = room_name
+        self.current_level = current_level
+        self._target_level = target_level
+        self._gold_limit = gold_limit
+        self.last_texts = []           # 마지막으로 읽은 화면 텍스트 (레벨 동기화용)
+        self.journal = MessageJournal()
+        self.last_known_gold = None
+        self.just_destroyed = False  # 파괴 직후 루프에서 OCR 스캔 동기화 스킵 플래그
+        self.finish_reason = None
+        self.label = ""              # 로그 접두어 (여러 채팅방 실행 시 "[채팅방] ")
+        self.attempts = 0
+        self.outcomes = {"success": 0, "keep": 0, "destroy": 0, "waiting": 0, "unknown": 0, "cooldown": 0}
+        self.governor = None         # MacroEngine.run에서 엔진 clock으로 생성
+        self.reach_prob = None       # 남은 골드로 목표 도달 확률 (POLICY_MIN_PROB 사용 시)
+
+    @property
+    def target_level(self):
+        """개별 지정이 없으면 전역 TARGET_LEVEL (메뉴 변경 즉시 반영)."""
+        return TARGET_LEVEL if self._target_level is None else self._target_level
+
+    @target_level.setter
+    def target_level(self, value):
+        self._target_level = value
+
+    @property
+    def gold_limit(self):
+        return GOLD_LIMIT if self._gold_limit is None else self._gold_limit
+
+    @gold_limit.setter
+    def gold_limit(self, value):
+        self._gold_limit = value
+
+    def snapshot(self):
+        """체크포인트용 상태 (레벨, 골드, 세션 카운터).
+        저널 메시지 ID는 프로세스마다 0부터 다시 매겨지므로 저장하지 않는다."""
+        return {
+            "level": self.current_level,
+            "gold": self.last_known_gold,
+            "attempts": self.attempts,
+            "outcomes": dict(self.outcomes),
+            "finished": self.finish_reason in ('goal', 'gold', 'policy'),
+            "saved_at": time.time(),
+        }
+
+    def restore(self, entry):
+        """체크포인트 항목에서 골드/세션 카운터 복원 (레벨은 호출 측에서 결정)."""
+        self.last_known_gold = entry.get("gold")
+        self.attempts = entry.get("attempts", 0)
+        for key, value in entry.get("outcomes", {}).items():
+            if key in self.outcomes:
+                self.outcomes[key] = value
+
+
+class Checkpoint:
+    """채팅방별 재개 지점 파일. 엔진이 통계와 같은 주기로 원자적으로 저장한다.
+
+    여러 프로세스가 서로 다른 채팅방으로 같은 파일을 쓰므로, 저장할 때마다 파일 잠금을
+    잡고 파일을 다시 읽어 이 프로세스가 돌리는 채팅방 항목만 덮어쓴다.
+    재시작 후 세션을 만들 때 현재 레벨은 채팅 기록 역방향 스캔으로 확인/보정한다.
+    재시작 시점에 이미 채팅에 있던 메시지는 저널 기준점이 되어 다시 집계되지 않으므로
+    통계가 중복 집계되지 않는다 (마지막 저장 이후 도착한 응답은 레벨 보정에만 쓰인다).
+    """
+
+    def __init__(self, filename=CHECKPOINT_FILE):
+        self.filename = filename
+        self.rooms = self.load()
+        self.owned = {}             # 이 프로세스가 돌리는 채팅방 -> 최신 항목
+
+    def load(self):
+        if self.filename and os.path.exists(self.filename):
+            try:
+                with open(self.filename, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("rooms", {})
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"[경고] 체크포인트 로드 실패: {e}")
+        return {}
+
+    def get(self, room_name):
+        """재개할 항목. 없거나 목표/골드 리밋으로 끝난 세션이면 None."""
+        entry = self.rooms.get(room_name)
+        if entry is None or entry.get("finished"):
+            return None
+        return entry
+
+    def update(self, sessions):
+        for session in sessions:
+            self.owned[session.room_name] = self.rooms[session.room_name] = session.snapshot()
+
+    def serialize(self):
+        """저장할 항목 (이 프로세스의 채팅방만). write()에 넘긴다."""
+        return dict(self.owned)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(self.filename + ".lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def write(self, entries):
+        """잠금을 잡고 파일의 다른 채팅방 항목은 그대로 둔 채 entries만 반영해 저장."""
+        if not self.filename:
+            return
+        with self._locked():
+            rooms = self.load()
+            rooms.update(entries)
+            atomic_write(self.filename, json.dumps({"version": 1, "rooms": rooms}, ensure_ascii=False, indent=2))
+
+    def save(self):
+        self.write(self.serialize())
+
+
+class MacroEngine:
+    """asyncio 기반 매크로 엔진.
+
+    읽기/전송은 스레드 풀에서 데드라인과 함께 실행하고, 통계 저장과 로그 출력은
+    별도 태스크로 분리한다. stop()은 어느 스레드에서든 호출할 수 있으며
+    진행 중인 대기를 끊고 루프를 깔끔하게 종료시킨다.
+    """
+
+    def __init__(self, stats, backend=None, clock=time.monotonic, sleep=asyncio.sleep, checkpoint=None):
+        self.stats = stats
+        self.checkpoint = checkpoint   # Checkpoint (None = 재개 지점 저장 안 함)
+        self.sessions = []
+        self.policy = PolicyTable()
+        self._policy_refreshed_at = 0
+        self.backend = backend if backend is not None else KakaoBackend()
+        self.clock = clock
+        self.sleep = sleep
+        self._loop = None
+        self._stop = None
+        self._send_lock = None     # 포커스가 필요한 전송을 채팅방 간 직렬화 (FIFO)
+        self._running = None       # clear = 일시정지 (진행 중인 시도는 끝까지 처리)
+        self._attempts_base = {}   # 채팅방 -> 이번 실행 시작 시점 시도 수 (속도 계산용)
+        self.started_at = None
+
+    # ---------- 제어 ----------
+    def stop(self):
+        global stop_requested
+        stop_requested = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    @property
+    def stopping(self):
+        return self._stop is not None and self._stop.is_set()
+
+    def _on_interrupt(self):
+        self.log("\n\n[중단됨]")
+        self.stop()
+
+    @property
+    def paused(self):
+        return self._running is not None and not self._running.is_set()
+
+    def pause(self):
+        if self._running is not None:
+            self._running.clear()
+
+    def resume(self):
+        if self._running is not None:
+            self._running.set()
+
+    async def _wait_if_paused(self):
+        """일시정지 중이면 재개나 정지까지 대기."""
+        if self._running.is_set():
+            return
+        waiters = [asyncio.ensure_future(self._running.wait()), asyncio.ensure_future(self._stop.wait())]
+        _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in pending:
+            waiter.cancel()
+
+    # ---------- 제어 소켓 ----------
+    def status(self):
+        """채팅방별 진행 상태와 구간별 소요 시간 (제어 소켓 status 응답)."""
+        elapsed_min = max(self.clock() - self.started_at, 1e-9) / 60 if self.started_at is not None else 0.0
+        sessions = []
+        for session in self.sessions:
+            done = session.attempts - self._attempts_base.get(session.room_name, 0)
+            sessions.append({
+                "room": session.room_name,
+                "level": session.current_level,
+                "target_level": session.target_level,
+                "gold": session.last_known_gold,
+                "gold_limit": session.gold_limit,
+                "attempts": session.attempts,
+                "attempts_per_min": round(done / elapsed_min, 1) if elapsed_min else 0.0,
+                "outcomes": dict(session.outcomes),
+                "send_interval": session.governor.interval if session.governor else None,
+                "reach_prob": session.reach_prob,
+                "finished": session.finish_reason,
+            })
+        phases = {name: {"count": count, "p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000}
+                  for name, (count, p50, p95, p99, _) in METRICS.summary().items()}
+        return {"paused": self.paused, "stopping": self.stopping,
+                "elapsed_sec": round(elapsed_min * 60, 1), "sessions": sessions, "phases": phases}
+
+    def _control(self, request):
+        """제어 요청 하나 처리. 응답 dict 반환."""
+        global TARGET_LEVEL, GOLD_LIMIT
+        cmd = request.get("cmd")
+        if cmd == "status":
+            return {"ok": True, **self.status()}
+        if cmd == "pause":
+            self.pause()
+            self.log("[제어] 일시정지 (진행 중인 시도는 마저 처리)")
+            return {"ok": True, "paused": True}
+        if cmd == "resume":
+            self.resume()
+            self.log("[제어] 재개")
+            return {"ok": True, "paused": False}
+        if cmd == "stop":
+            self.log("[제어] 정지 요청")
+            self.stop()
+            return {"ok": True}
+        if cmd == "set":
+            changes = {}
+            for key, low in (("target_level", 1), ("gold_limit", 0)):
+                if key in request:
+                    try:
+                        value = int(request[key])
+                    except (TypeError, ValueError):
+                        return {"ok": False, "error": f"{key}는 정수여야 합니다"}
+                    if value < low or (key == "target_level" and value > MAX_LEVEL):
+                        return {"ok": False, "error": f"{key} 범위 초과: {value}"}
+                    changes[key] = value
+            if not changes:
+                return {"ok": False, "error": "target_level 또는 gold_limit가 필요합니다"}
+            room = request.get("room")
+            if room is None:
+                # 전역 설정 변경: 개별 지정이 없는 모든 채팅방에 다음 확인부터 반영
+                if "target_level" in changes:
+                    TARGET_LEVEL = changes["target_level"]
+                if "gold_limit" in changes:
+                    GOLD_LIMIT = changes["gold_limit"]
+            else:
+                targets = [s for s in self.sessions if s.room_name == room]
+                if not targets:
+                    return {"ok": False, "error": f"채팅방 없음: {room}"}
+                for session in targets:
+                    for key, value in changes.items():
+                        setattr(session, key, value)
+            self.log(f"[제어] 설정 변경{f' ({room})' if room else ''}: "
+                     + ", ".join(f"{key}={value:,}" for key, value in changes.items()))
+            return {"ok": True, **changes}
+        return {"ok": False, "error": f"알 수 없는 명령: {cmd}"}
+
+    async def _handle_control(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    response = self._control(request) if isinstance(request, dict) else \
+                        {"ok": False, "error": "JSON 객체가 필요합니다"}
+                except json.JSONDecodeError as e:
+                    response = {"ok": False, "error": f"JSON 오류: {e}"}
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _start_control_server(self, path):
+        """제어 소켓 시작. 다른 매크로가 이미 쓰고 있거나 경로가 소켓이 아닌 파일이면 None."""
+        if os.path.lexists(path) and not is_socket(path):
+            self.log(f"[제어] {path}는 소켓이 아닌 파일 - 지우지 않고 제어 소켓 없이 실행", logging.ERROR)
+            return None
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                self.log(f"[제어] {path}를 다른 매크로가 사용 중 - 제어 소켓 없이 실행")
+                return None
+            except OSError:
+                os.unlink(path)   # 비정상 종료로 남은 소켓 파일
+            finally:
+                probe.close()
+        server = await asyncio.start_unix_server(self._handle_control, path=path)
+        os.chmod(path, 0o600)
+        self.log(f"[제어] 소켓: {path}")
+        return server
+
+    # ---------- 태스크 ----------
+    def log(self, message, level=logging.INFO):
+        """로그 큐에 넣기만 한다 (출력은 리스너 스레드). 레벨 미만이면 아무 것도 하지 않는다.
+        호출 위치 탐색(findCaller)은 매 시도마다 반복되는 비용이라 건너뛴다.
+        """
+        if logger.isEnabledFor(level):
+            logger.handle(logger.makeRecord(logger.name, level, __file__, 0, message, None, None))
+
+    def _slog(self, session, message, level=logging.INFO):
+        """세션 로그: 채팅방 접두어를 앞쪽 줄바꿈 뒤에 붙인다."""
+        if not logger.isEnabledFor(level):
+            return
+        body = message.lstrip("\n")
+        self.log(message[:len(message) - len(body)] + session.label + body, level)
+
+    async def _persist_worker(self):
+        while True:
+            await asyncio.sleep(STATS_FLUSH_INTERVAL)  # 실제 시간 기준 (재생 시 가상 clock과 무관)
+            if self.stats.dirty:
+                # 직렬화는 루프 스레드에서, 파일 쓰기만 스레드에서
+                with METRICS.span('stats_save'):
+                    await self._io(READ_TIMEOUT, self.stats.write, self.stats.serialize())
+                    if self.checkpoint is not None:
+                        self.checkpoint.update(self.sessions)
+                        await self._io(READ_TIMEOUT, self.checkpoint.write, self.checkpoint.serialize())
+
+    async def _metrics_worker(self):
+        while True:
+            await asyncio.sleep(METRICS_EXPORT_INTERVAL)
+            await self._io(READ_TIMEOUT, METRICS.write_file, METRICS_FILE)
+
+    async def _io(self, timeout, func, *args):
+        """blocking 함수를 스레드에서 실행. 데드라인 초과 시 None."""
+        future = self._loop.run_in_executor(None, func, *args)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.log(f"[데드라인 초과] {func.__name__} ({timeout}초)", logging.WARNING)
+            return None
+
+    async def run(self, sessions, handle_signals=False):
+        """모든 세션이 끝날 때까지 실행 (목표 달성, 골드 리밋, 창 없음, stop()).
+
+        sessions는 MacroSession 하나 또는 리스트. 읽기는 채팅방마다 동시에 진행하고
+        전송만 하나씩 순서대로 처리한다.
+        """
+        if isinstance(sessions, MacroSession):
+            sessions = [sessions]
+        self.sessions = sessions
+        for session in sessions:
+            if len(sessions) > 1:
+                session.label = f"[{session.room_name}] "
+            if session.governor is None:
+                session.governor = ThroughputGovernor(clock=self.clock)
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        owns_log = start_logging()
+        self._send_lock = asyncio.Lock()
+        self._running = asyncio.Event()
+        self._running.set()
+        self._attempts_base = {session.room_name: session.attempts for session in sessions}
+        self.started_at = self.clock()
+        self.stats.autosave = False
+        if POLICY_MIN_PROB > 0:
+            self.policy.set_rates(self.stats.store.level_rates())
+            self.policy.set_costs(self.stats.store.gold_costs())
+        if handle_signals:
+            try:
+                self._loop.add_signal_handler(signal.SIGINT, self._on_interrupt)
+            except (NotImplementedError, RuntimeError):
+                handle_signals = False
+        workers = [asyncio.ensure_future(self._persist_worker())]
+        metrics_server = None
+        if METRICS.enabled:
+            if METRICS_FILE:
+                workers.append(asyncio.ensure_future(self._metrics_worker()))
+            if METRICS_PORT:
+                metrics_server = METRICS.serve(METRICS_PORT)
+                self.log(f"[계측] http://127.0.0.1:{METRICS_PORT}/metrics")
+        control_server = await self._start_control_server(CONTROL_SOCKET) if CONTROL_SOCKET else None
+        try:
+            await asyncio.gather(*(self._run_session(session) for session in sessions))
+            for session in sessions:
+                self._slog(session, session.governor.report())
+            if METRICS.enabled:
+                self.log(METRICS.format_summary())
+            if len(sessions) > 1:
+                self._log_summary(sessions)
+        finally:
+            if handle_signals:
+                self._loop.remove_signal_handler(signal.SIGINT)
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if metrics_server is not None:
+                metrics_server.shutdown()
+            if control_server is not None:
+                control_server.close()
+                if is_socket(CONTROL_SOCKET):
+                    os.unlink(CONTROL_SOCKET)
+            if METRICS.enabled and METRICS_FILE:
+                METRICS.write_file(METRICS_FILE)
+            self.stats.flush()
+            if self.checkpoint is not None:
+                self.checkpoint.update(sessions)
+                self.checkpoint.save()
+            self.stats.autosave = True
+            if owns_log:
+                stop_logging()
+            self._loop = None
+
+    # ---------- 세션 루프 ----------
+    async def _run_session(self, session):
+        room = session.room_name
+        backend = self.backend
+        while not self.stopping:
+            await self._wait_if_paused()
+            if self.stopping:
+                break
+            # 창 확인 (AX API 모드에서도 창 존재 확인용)
+            with METRICS.span('window_check'):
+                window_ok = await self._io(READ_TIMEOUT, backend.window_exists, room)
+            if not window_ok:
+                self._slog(session, "[오류] 채팅방 창을 찾을 수 없음", logging.ERROR)
+                session.finish_reason = 'window'
+                return
+
+            # 명령어 전송 전: 현재 레벨 동기화
+            with METRICS.span('pre_read'):
+                pre_texts = await self._observe(session)
+            if pre_texts is None:
+                pre_texts = []
+            if session.just_destroyed:
+                session.just_destroyed = False
+            else:
+                self._sync_level(session, pre_texts)
+
+            # 목표 레벨 도달 확인 (전송 전)
+            if self._check_goal(session):
+                return
+            if self._check_policy(session):
+                return
+            if self.stopping:
+                break
+
+            # 명령어 전송
+            gold_display = f", 골드: {session.last_known_gold:,}G" if session.last_known_gold is not None else ""
+            if session.reach_prob is not None:
+                gold_display += f", 도달 확률 {session.reach_prob * 100:.1f}%"
+            self._slog(session, f"[전송] {COMMAND} (현재: +{session.current_level}{gold_display})")
+            wait = session.governor.reserve()
+            if wait > 0:
+                await self.sleep(wait)
+            async with self._send_lock:
+                if self.stopping:
+                    break
+                with METRICS.span('send'):
+                    sent = await self._io(SEND_TIMEOUT, backend.send, COMMAND, room, self.stats)
+            session.governor.on_sent()
+            if not sent:
+                # 재전송까지 실패: 5초 응답 대기 없이 창 확인/동기화부터 다시 시작
+                continue
+
+            mark = session.journal.last_id
+            with METRICS.span('reply_wait'):
+                result, from_lvl, to_lvl = await self._wait_reply(session, mark)
+            session.outcomes[result] += 1
+            if result != 'cooldown':
+                session.attempts += 1
+            texts = session.last_texts
+            new_texts = session.journal.since(mark)
+
+            # 골드 파싱 (새 텍스트에서)
+            parsed_gold = parse_remaining_gold(new_texts)
+            if parsed_gold is None and not use_ax_api:
+                fuzzy_gold, confidence = OCR_MATCHER.parse_gold(new_texts)
+                if confidence >= FUZZY_ACCEPT_CONFIDENCE:
+                    parsed_gold = fuzzy_gold
+            if self._update_gold(session, parsed_gold):
+                return
+            if result == 'cooldown':
+                wait_hint = parse_cooldown(new_texts)
+                session.governor.on_cooldown(wait_hint)
+                self._slog(session, f"[쿨다운] 봇 과속 응답 - 전송 간격 {session.governor.interval:.2f}초로 조정"
+                                    + (f", {wait_hint:g}초 대기" if wait_hint else ""))
+                continue
+            session.governor.on_reply()
+            if self._apply_result(session, result, from_lvl, to_lvl, texts):
+                return
+        session.finish_reason = 'stopped'
+
+    async def _observe(self, session):
+        """채팅을 읽어 세션 저널에 반영하고 화면 텍스트를 반환 (실패 시 None)."""
+        room = session.room_name
+        rows = await self._io(READ_TIMEOUT, self.backend.read_rows, room)
+        if rows is not None:
+            row_count, row_texts = rows
+            session.journal.observe_rows(row_count, row_texts)
+            texts = [t for row in row_texts for t in row]
+        else:
+            texts = await self._io(READ_TIMEOUT, self.backend.read_texts, room)
+            if texts is None:
+                return None
+            session.journal.observe_texts(texts)
+        session.last_texts = texts
+        return texts
+
+    async def _wait_reply(self, session, mark):
+        """mark 이후 메시지로 봇 응답을 REPLY_TIMEOUT까지 폴링. (result, from, to) 반환."""
+        start_time = self.clock()
+        result = 'waiting'
+        from_lvl, to_lvl = None, None
+        while result in ('waiting', 'unknown') and (self.clock() - start_time) < REPLY_TIMEOUT:
+            await self.sleep(REPLY_POLL_INTERVAL)
+            if self.stopping:
+                break
+            texts = await self._observe(session)
+            if texts is None:
+                continue
+            parse_start = time.perf_counter() if METRICS.enabled else None
+            new_texts = session.journal.since(mark)
+            result, from_lvl, to_lvl = classify_response(new_texts, texts, session.current_level)
+            if result in ('waiting', 'unknown') and new_texts and not use_ax_api:
+                # OCR 오인식: 퍼지 판정 신뢰도가 높으면 5초 타임아웃 없이 바로 채택
+                fuzzy_result, fuzzy_from, fuzzy_to, confidence = OCR_MATCHER.classify(
+                    new_texts, session.current_level)
+                if confidence >= FUZZY_ACCEPT_CONFIDENCE:
+                    self._slog(session, f"[OCR 보정] 퍼지 판정: {fuzzy_result} (신뢰도 {confidence:.2f})")
+                    result, from_lvl, to_lvl = fuzzy_result, fuzzy_from, fuzzy_to
+            if parse_start is not None:
+                METRICS.observe('parse', time.perf_counter() - parse_start)
+        return result, from_lvl, to_lvl
+
+    def _log_summary(self, sessions):
+        elapsed_min = max(self.clock() - self.started_at, 1e-9) / 60
+        total = 0
+        lines = ["\n[채팅방별 결과]"]
+        for session in sessions:
+            total += session.attempts
+            o = session.outcomes
+            lines.append(f"  {session.room_name}: +{session.current_level}, 시도 {session.attempts}회 "
+                         f"(성공 {o['success']}, 유지 {o['keep']}, 파괴 {o['destroy']}, "
+                         f"시간초과 {o['waiting'] + o['unknown']}) - {session.finish_reason}")
+        lines.append(f"  합계: {total}회, {total / elapsed_min:.1f}회/분")
+        self.log("\n".join(lines))
+
+    def _sync_level(self, session, texts):
+        scanned_level = scan_current_level(texts, session.current_level)
+        if scanned_level is None or scanned_level == session.current_level:
+            return
+        if scanned_level > session.current_level:
+            self._slog(session, f"[동기화] +{session.current_level} -> +{scanned_level}")
+            session.current_level = scanned_level
+        else:
+            self._slog(session, f"[동기화 무시] 스캔 +{scanned_level} < 현재 +{session.current_level}")
+
+    def _check_goal(self, session, label="목표 달성!"):
+        if session.current_level < session.target_level:
+            return False
+        self._slog(session, f"\n{'='*55}\n  {label} +{session.current_level} (목표: +{session.target_level})\n{'='*55}\n", logging.WARNING)
+        session.finish_reason = 'goal'
+        return True
+
+    def _check_policy(self, session):
+        """남은 골드로 목표 도달 확률이 POLICY_MIN_PROB 미만이면 정지 (확률표 조회는 O(1))."""
+        if POLICY_MIN_PROB <= 0 or session.last_known_gold is None:
+            return False
+        attempts = sum(s.attempts for s in self.sessions)
+        if attempts - self._policy_refreshed_at >= POLICY_REFRESH_ATTEMPTS:
+            self._policy_refreshed_at = attempts
+            self.policy.set_rates(self.stats.store.level_rates())
+        budget = session.last_known_gold - max(session.gold_limit, 0)
+        prob = self.policy.prob(session.current_level, budget, session.target_level)
+        session.reach_prob = prob
+        if prob is None or prob >= POLICY_MIN_PROB:
+            return False
+        self._slog(session, f"\n{'='*55}\n  정책 정지: 남은 골드로 +{session.target_level} 도달 확률 "
+                            f"{prob * 100:.2f}% (최소 {POLICY_MIN_PROB * 100:.1f}%)\n{'='*55}\n", logging.WARNING)
+        session.finish_reason = 'policy'
+        return True
+
+    def _update_gold(self, session, parsed_gold):
+        """골드 갱신. 골드 리밋 도달 시 True."""
+        if parsed_gold is None:
+            return False
+        previous = session.last_known_gold
+        if previous is not None and parsed_gold < previous:
+            self.policy.observe_cost(session.current_level, previous - parsed_gold)
+        session.last_known_gold = parsed_gold
+        self._slog(session, f"[골드] 남은 골드: {parsed_gold:,}G")
+        gold_limit = session.gold_limit
+        if gold_limit > 0 and parsed_gold < gold_limit:
+            self._slog(session, f"\n{'='*55}\n  골드 리밋 도달! 남은 골드: {parsed_gold:,}G (리밋: {gold_limit:,}G)\n{'='*55}\n", logging.WARNING)
+            session.finish_reason = 'gold'
+            return True
+        return False
+
+    def _apply_result(self, session, result, from_lvl, to_lvl, texts):
+        """판정 결과를 통계/레벨에 반영. 세션 종료 조건이면 True."""
+        stats = self.stats
+        room, gold = session.room_name, session.last_known_gold
+        if result == 'success':
+            if from_lvl is not None and to_lvl is not None:
+                stats.record_success(from_lvl, to_lvl, room, gold)
+                session.current_level = to_lvl
+                self._slog(session, f"[성공] +{from_lvl} -> +{to_lvl}")
+            else:
+                stats.record_success(session.current_level, session.current_level + 1, room, gold)
+                session.current_level += 1
+                self._slog(session, f"[성공] 추정 +{session.current_level}")
+            return self._check_goal(session)
+        if result == 'destroy':
+            destroy_lvl = from_lvl if from_lvl is not None else session.current_level
+            stats.record_destroy(destroy_lvl, room, gold)
+            self._slog(session, f"[파괴] +{destroy_lvl}에서 파괴됨")
+            session.current_level = 0
+            session.just_destroyed = True  # 다음 루프 OCR 스캔 스킵
+        elif result == 'keep':
+            keep_lvl = from_lvl if from_lvl is not None else session.current_level
+            stats.record_keep(keep_lvl, room, gold)
+            self._slog(session, f"[유지] +{keep_lvl} 레벨 유지됨")
+        elif result == 'waiting':
+            self._slog(session, "[시간초과] 응답 없음 - 화면 스캔으로 레벨 동기화")
+            match = re.search(r'\[\+(\d+)\]', ' '.join(texts))
+            if match:
+                scanned = int(match.group(1))
+                if scanned > MAX_LEVEL:
+                    self._slog(session, f"[OCR 보정] 타임아웃 스캔 범위 초과 무시: +{scanned} (최대 +{MAX_LEVEL})")
+                elif scanned < session.current_level:
+                    self._slog(session, f"[파괴 감지] +{session.current_level} -> +{scanned} (타임아웃 스캔)")
+                    stats.record_destroy(session.current_level, room, gold)
+                    session.current_level = scanned
+                    session.just_destroyed = True
+                elif scanned != session.current_level:
+                    self._slog(session, f"[동기화] +{session.current_level} -> +{scanned}")
+                    session.current_level = scanned
+            return self._check_goal(session, "목표 달성 (동기화)!")
+        return False
+
+
+# ============================================================
+# 트레이스 기록/재생
+# ============================================================
+TRACE_VERSION = 1
+
+
+def _open_trace(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class TraceRecorder:
+    """채팅 백엔드를 감싸 모든 읽기/전송 결과와 시각을 JSON Lines로 기록.
+
+    한 줄이 이벤트 하나: {"t": 시작 후 초, "e": 종류, "r": 채팅방, "v": 값}
+    종류: h=헤더, w=창 확인, r=행 읽기(read_rows), x=텍스트 읽기(read_texts), s=전송
+    """
+
+    def __init__(self, backend, path, clock=time.monotonic):
+        self.backend = backend
+        self.path = path
+        self.clock = clock
+        self._start = clock()
+        self._lock = threading.Lock()
+        self._file = _open_trace(path, 'w')
+
+    def _record(self, kind, room_name, value):
+        event = {"t": round(self.clock() - self._start, 4), "e": kind, "r": room_name, "v": value}
+        line = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+        return value
+
+    def header(self, sessions):
+        """재생 시 같은 조건으로 세션을 만들 수 있도록 시작 상태 기록."""
+        self._record('h', None, {
+            "version": TRACE_VERSION,
+            "command": COMMAND,
+            "sessions": [{"room": s.room_name, "level": s.current_level, "target": s.target_level}
+                         for s in sessions],
+        })
+
+    def window_exists(self, room_name):
+        return self._record('w', room_name, bool(self.backend.window_exists(room_name)))
+
+    def read_rows(self, room_name):
+        result = self.backend.read_rows(room_name)
+        self._record('r', room_name, None if result is None else [result[0], result[1]])
+        return result
+
+    def read_texts(self, room_name):
+        return self._record('x', room_name, self.backend.read_texts(room_name))
+
+    def send(self, command, room_name, stats=None):
+        return self._record('s', room_name, self.backend.send(command, room_name, stats))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplayBackend:
+    """TraceRecorder 파일을 채팅방별 순서대로 되돌려주는 백엔드 (macOS 불필요).
+
+    엔진의 호출 순서가 기록 당시와 같으면 결과도 같다. 다른 종류의 호출이 오면
+    (판정 로직 변경 등으로 흐름이 달라진 경우) 그 종류의 다음 이벤트까지 건너뛰고
+    mismatches에 남긴다. 기록이 끝나면 창이 닫힌 것으로 보고 세션을 끝낸다.
+    clock()은 마지막으로 재생한 이벤트의 기록 시각이라, 엔진에 clock과 async_sleep을
+    넘기면 실제 대기 없이 기록된 시간 흐름대로 재생된다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.events = {}
+        self.mismatches = []
+        self.now = 0.0
+        with _open_trace(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["e"] == 'h':
+                    self.header = event["v"]
+                    continue
+                self.events.setdefault(event["r"], deque()).append(event)
+
+    def clock(self):
+        return self.now
+
+    async def async_sleep(self, delay):
+        await asyncio.sleep(0)
+
+    def _next(self, kind, room_name):
+        queue = self.events.get(room_name)
+        skipped = 0
+        while queue:
+            event = queue.popleft()
+            if event["e"] == kind:
+                if skipped:
+                    self.mismatches.append((event["t"], room_name, kind, skipped))
+                self.now = max(self.now, event["t"])
+                return event
+            skipped += 1
+        if skipped:
+            self.mismatches.append((self.now, room_name, kind, skipped))
+        # 기록이 끝난 채팅방: 시간만 흘려 응답 대기가 타임아웃으로 끝나게 한다
+        self.now += REPLY_POLL_INTERVAL
+        return None
+
+    def window_exists(self, room_name):
+        event = self._next('w', room_name)
+        return bool(event and event["v"])
+
+    def read_rows(self, room_name):
+        queue = self.events.get(room_name)
+        if queue and queue[0]["e"] == 'x':
+            return None  # 기록 당시 OCR 모드: read_texts로 넘어가게 한다
+        event = self._next('r', room_name)
+        if event is None or event["v"] is None:
+            return None
+        return event["v"][0], event["v"][1]
+
+    def read_texts(self, room_name):
+        event = self._next('x', room_name)
+        return event["v"] if event else None
+
+    def send(self, command, room_name, stats=None):
+        event = self._next('s', room_name)
+        return bool(event and event["v"])
+
+    def sessions(self):
+        """헤더에 기록된 시작 상태로 MacroSession 목록 생성."""
+        if not self.header:
+            return [MacroSession(room, 0) for room in self.events]
+        return [MacroSession(s["room"], s["level"], target_level=s["target"])
+                for s in self.header["sessions"]]
+
+
+def make_backend():
+    """KakaoBackend 생성. TRACE_FILE이 설정돼 있으면 기록기로 감싼다."""
+    backend = KakaoBackend()
+    if TRACE_FILE:
+        backend = TraceRecorder(backend, TRACE_FILE)
+    return backend
+
+
+def replay_trace(path, stats=None):
+    """트레이스 파일을 실제 대기 없이 엔진에 재생. (세션 목록, 재생 백엔드) 반환."""
+    replay = ReplayBackend(path)
+    if stats is None:
+        stats = EnhanceStats(filename=None)
+    engine = MacroEngine(stats, backend=replay, clock=replay.clock, sleep=replay.async_sleep)
+    sessions = replay.sessions()
+    asyncio.run(engine.run(sessions))
+    return sessions, replay
+
+
 # ============================================================
 # 메인
 # ============================================================
+LEVEL_SCAN_ROWS = 30           # 현재 레벨 자동 감지 시 읽는 최근 행 수 (AX 모드)
+WINDOW_WAIT_TIMEOUT = 60.0     # 헤드리스 실행 시 채팅방 창이 뜨기를 기다리는 시간 (초)
+
+
 def main():
     global TARGET_CHAT_ROOM, TARGET_LEVEL, GOLD_LIMIT, stop_requested, use_ax_api
 
@@ -556,9 +2966,10 @@ def main():
     print("\n  카카오톡에서 채팅방을 열어주세요.")
     while True:
         room = input("  채팅방 이름: ").strip()
-        if room and find_kakao_window(room):
-            TARGET_CHAT_ROOM = room
-            print(f"  -> '{room}' 감지됨!\n")
+        title = choose_kakao_window(room) if room else None
+        if title:
+            TARGET_CHAT_ROOM = title
+            print(f"  -> '{title}' 감지됨!\n")
             break
         print("  -> 찾을 수 없음. 다시 입력하세요.\n")
 
@@ -574,7 +2985,8 @@ def main():
         print("  4. room   - 채팅방 변경")
         print("  5. goal   - 목표 레벨 변경")
         print("  6. gold   - 골드 리밋 변경")
-        print("  7. quit   - 종료")
+        print("  7. multi  - 여러 채팅방 동시 실행")
+        print("  8. quit   - 종료")
         print("-" * 55)
 
         cmd = input("\n입력: ").strip().lower()
@@ -591,9 +3003,10 @@ def main():
 
         elif cmd in ['4', 'room']:
             new_room = input("새 채팅방: ").strip()
-            if new_room and find_kakao_window(new_room):
-                TARGET_CHAT_ROOM = new_room
-                print(f"변경됨: {new_room}")
+            title = choose_kakao_window(new_room) if new_room else None
+            if title:
+                TARGET_CHAT_ROOM = title
+                print(f"변경됨: {title}")
             else:
                 print("찾을 수 없음")
 
@@ -616,12 +3029,34 @@ def main():
             except ValueError:
                 print("숫자를 입력하세요")
 
-        elif cmd in ['7', 'quit', 'q']:
+        elif cmd in ['7', 'multi']:
+            run_macro_multi(stats)
+
+        elif cmd in ['8', 'quit', 'q']:
             print("\n종료합니다.")
             stats.print_stats()
             break
 
 
+def prompt_current_level(room_name=None):
+    """현재 레벨 수동 입력."""
+    prefix = f"[{room_name}] " if room_name else ""
+    while True:
+        try:
+            user_input = input(f"  {prefix}현재 레벨 입력 (숫자만, 목표: +{TARGET_LEVEL}): ").strip()
+            current_level = int(user_input)
+            if current_level < 0:
+                print("  0 이상의 숫자를 입력하세요.")
+                continue
+            if current_level >= TARGET_LEVEL:
+                print(f"  [경고] 현재 레벨 +{current_level}이 이미 목표 +{TARGET_LEVEL} 이상입니다.")
+                print(f"  목표 레벨을 변경하거나 (메뉴 5. goal), 다른 레벨을 입력하세요.")
+                continue
+            return current_level
+        except ValueError:
+            print("  숫자를 입력하세요.")
+
+
 def run_macro(stats):
     """매크로 실행"""
     global stop_requested
@@ -640,155 +3075,294 @@ def run_macro(stats):
         print("  읽기 모드: OCR (화면 캡처)")
     print("  정지: Ctrl+C")
     print("=" * 55 + "\n")
-    # 현재 레벨 수동 입력
-    while True:
-        try:
-            user_input = input(f"  현재 레벨 입력 (숫자만, 목표: +{TARGET_LEVEL}): ").strip()
-            current_level = int(user_input)
-            if current_level < 0:
-                print("  0 이상의 숫자를 입력하세요.")
-                continue
-            if current_level >= TARGET_LEVEL:
-                print(f"  [경고] 현재 레벨 +{current_level}이 이미 목표 +{TARGET_LEVEL} 이상입니다.")
-                print(f"  목표 레벨을 변경하거나 (메뉴 5. goal), 다른 레벨을 입력하세요.")
-                continue
-            break
-        except ValueError:
-            print("  숫자를 입력하세요.")
+    checkpoint = Checkpoint()
+    session = resume_session(TARGET_CHAT_ROOM, checkpoint)
+    if session is None:
+        session = MacroSession(TARGET_CHAT_ROOM, prompt_current_level())
+    _run_engine(stats, [session], checkpoint)
 
-    last_texts = []
-    last_known_gold = None
-    just_destroyed = False  # 파괴 직후 루프에서 OCR 스캔 동기화 스킵 플래깅
+    print("\n매크로 종료")
+    stats.print_stats()
 
-    def _read_texts():
-        """현재 모드에 따라 채팅 텍스트를 읽는 헬퍼."""
-        global use_ax_api
-        if use_ax_api:
-            result = read_chat_text_ax(TARGET_CHAT_ROOM, last_n=5)
-            if result is not None:
-                return result
-            # AX API 실패 → OCR fallback
-            if OCR_AVAILABLE:
-                print("[AX API 실패] OCR fallback으로 전환")
-                use_ax_api = False
-                bounds = get_window_bounds(TARGET_CHAT_ROOM)
-                return read_chat_text(capture_chat_area(bounds)) if bounds else []
-            return []
-        else:
-            bounds = get_window_bounds(TARGET_CHAT_ROOM)
-            return read_chat_text(capture_chat_area(bounds)) if bounds else []
 
+def _run_engine(stats, sessions, checkpoint=None):
+    """세션들을 엔진으로 실행 (TRACE_FILE 설정 시 읽기/전송 기록)."""
+    backend = make_backend()
+    if isinstance(backend, TraceRecorder):
+        backend.header(sessions)
+        print(f"  [기록] 트레이스: {backend.path}")
+    engine = MacroEngine(stats, backend=backend, checkpoint=checkpoint)
     try:
-        while not stop_requested:
-            # 창 확인 (AX API 모드에서도 창 존재 확인용)
-            bounds = get_window_bounds(TARGET_CHAT_ROOM)
-            if not bounds:
-                print("[오류] 채팅방 창을 찾을 수 없음")
-                break
-
-            # 명령어 전송 전: 현재 레벨 동기화
-            pre_texts = _read_texts()
-            if just_destroyed:
-                just_destroyed = False
-            else:
-                scanned_level = scan_current_level(pre_texts, current_level)
-                if scanned_level is not None and scanned_level != current_level:
-                    if scanned_level > current_level:
-                        print(f"[동기화] +{current_level} -> +{scanned_level}")
-                        current_level = scanned_level
-                    else:
-                        print(f"[동기화 무시] 스캔 +{scanned_level} < 현재 +{current_level}")
-            last_texts = pre_texts
+        asyncio.run(engine.run(sessions, handle_signals=True))
+    except KeyboardInterrupt:
+        print("\n\n[중단됨]")
+    finally:
+        if isinstance(backend, TraceRecorder):
+            backend.close()
 
-            # 목표 레벨 도달 확인 (전송 전)
-            if current_level >= TARGET_LEVEL:
-                print(f"\n{'='*55}")
-                print(f"  목표 달성! +{current_level} (목표: +{TARGET_LEVEL})")
-                print(f"{'='*55}\n")
-                break
-            # 명령어 전송
-            gold_display = f", 골드: {last_known_gold:,}G" if last_known_gold is not None else ""
-            print(f"[전송] {COMMAND} (현재: +{current_level}{gold_display})")
-            send_command(COMMAND, TARGET_CHAT_ROOM)
-
-            time.sleep(0.05)
-            start_time = time.time()
-            result = 'waiting'
-            from_lvl, to_lvl = None, None
-            texts = last_texts.copy()
-            snapshot_texts = last_texts.copy()
-            while result in ('waiting', 'unknown') and (time.time() - start_time) < 5:
-                time.sleep(0.1)
-                texts = _read_texts()
-                result, from_lvl, to_lvl = check_response(texts, snapshot_texts, current_level)
-            last_texts = texts.copy()
 
-            # 골드 파싱 (새 텍스트에서)
-            new_texts_for_gold = [t for t in texts if t not in snapshot_texts]
-            parsed_gold = parse_remaining_gold(new_texts_for_gold)
-            if parsed_gold is not None:
-                last_known_gold = parsed_gold
-                gold_info = f"{last_known_gold:,}G"
-                print(f"[골드] 남은 골드: {gold_info}")
-                if GOLD_LIMIT > 0 and last_known_gold < GOLD_LIMIT:
-                    print(f"\n{'='*55}")
-                    print(f"  골드 리밋 도달! 남은 골드: {last_known_gold:,}G (리밋: {GOLD_LIMIT:,}G)")
-                    print(f"{'='*55}\n")
-                    break
+def run_macro_multi(stats):
+    """여러 채팅방 동시 실행 (목표/골드 리밋은 현재 설정 공유)"""
+    global stop_requested
+    stop_requested = False
 
-            if result == 'success':
-                if from_lvl is not None and to_lvl is not None:
-                    stats.record_success(from_lvl, to_lvl)
-                    current_level = to_lvl
-                    print(f"[성공] +{from_lvl} -> +{to_lvl}")
-                else:
-                    stats.record_success(current_level, current_level + 1)
-                    current_level += 1
-                    print(f"[성공] 추정 +{current_level}")
-                if current_level >= TARGET_LEVEL:
-                    print(f"\n{'='*55}")
-                    print(f"  목표 달성! +{current_level} (목표: +{TARGET_LEVEL})")
-                    print(f"{'='*55}\n")
-                    break
-            elif result == 'destroy':
-                destroy_lvl = from_lvl if from_lvl is not None else current_level
-                stats.record_destroy(destroy_lvl)
-                print(f"[파괴] +{destroy_lvl}에서 파괴됨")
-                current_level = 0
-                just_destroyed = True  # 다음 루프 OCR 스캔 스킵
-            elif result == 'keep':
-                keep_lvl = from_lvl if from_lvl is not None else current_level
-                stats.record_keep(keep_lvl)
-                print(f"[유지] +{keep_lvl} 레벨 유지됨")
-            elif result == 'waiting':
-                print("[시간초과] 응답 없음 - 화면 스캔으로 레벨 동기화")
-                combined_all = ' '.join(texts)
-                match = re.search(r'\[\+(\d+)\]', combined_all)
-                if match:
-                    scanned = int(match.group(1))
-                    if scanned > MAX_LEVEL:
-                        print(f"[OCR 보정] 타임아웃 스캔 범위 초과 무시: +{scanned} (최대 +{MAX_LEVEL})")
-                    elif scanned < current_level:
-                        print(f"[파괴 감지] +{current_level} -> +{scanned} (타임아웃 스캔)")
-                        stats.record_destroy(current_level)
-                        current_level = scanned
-                        just_destroyed = True
-                    elif scanned != current_level:
-                        print(f"[동기화] +{current_level} -> +{scanned}")
-                        current_level = scanned
-                if current_level >= TARGET_LEVEL:
-                    print(f"\n{'='*55}")
-                    print(f"  목표 달성 (동기화)! +{current_level} (목표: +{TARGET_LEVEL})")
-                    print(f"{'='*55}\n")
-                    break
-            time.sleep(0.05)
+    rooms = []
+    for name in input("  채팅방 이름들 (쉼표로 구분): ").split(','):
+        name = name.strip()
+        title = choose_kakao_window(name) if name else None
+        if title in rooms:
+            continue
+        if title:
+            rooms.append(title)
+        elif name:
+            print(f"  -> '{name}' 찾을 수 없음, 제외")
+    if not rooms:
+        print("  실행할 채팅방이 없습니다.")
+        return
 
-    except KeyboardInterrupt:
-        print("\n\n[중단됨]")
+    print("\n" + "=" * 55)
+    print(f"  매크로 시작 - 대상: {', '.join(rooms)} ({len(rooms)}개)")
+    print(f"  목표: +{TARGET_LEVEL} 도달시 정지 (채팅방별)")
+    print("  정지: Ctrl+C")
+    print("=" * 55 + "\n")
+    checkpoint = Checkpoint()
+    sessions = [resume_session(room, checkpoint) or MacroSession(room, prompt_current_level(room))
+                for room in rooms]
+    _run_engine(stats, sessions, checkpoint)
 
     print("\n매크로 종료")
     stats.print_stats()
 
 
+def parse_args(argv=None):
+    """명령줄 인자 + 설정 파일(--config JSON) 병합. 명령줄 인자가 설정 파일보다 우선."""
+    parser = argparse.ArgumentParser(
+        description="카카오톡 강화 매크로 (채팅방을 지정하면 메뉴 없이 바로 시작, 없으면 대화형 메뉴)")
+    parser.add_argument("--config", help="설정 JSON 파일 (room/rooms, goal, gold_limit, level, backend, stats_file, "
+                                         "wait, socket, log_level, log_file)")
+    parser.add_argument("--room", action="append", dest="rooms", help="채팅방 이름 (여러 번 지정 가능)")
+    parser.add_argument("--rooms", dest="room_list", help="채팅방 이름들 (쉼표로 구분)")
+    parser.add_argument("--goal", type=int, help=f"목표 레벨 (기본 +{TARGET_LEVEL})")
+    parser.add_argument("--gold-limit", type=int, help="이 골드 미만이 되면 정지 (0 = 비활성화)")
+    parser.add_argument("--level", help="현재 레벨 숫자 또는 auto (채팅방이 여러 개면 쉼표로 구분, 기본 auto)")
+    parser.add_argument("--backend", choices=["ax", "ocr"], help="읽기 방식 (기본: AX 가능하면 ax)")
+    parser.add_argument("--stats-file", help=f"통계 파일 (기본 {STATS_FILE})")
+    parser.add_argument("--wait", type=float, help=f"채팅방 창 대기 시간 (초, 기본 {WINDOW_WAIT_TIMEOUT:g})")
+    parser.add_argument("--socket", help="제어 소켓 경로 (실행 시 소켓을 열고, --ctl은 이 소켓으로 요청)")
+    parser.add_argument("--log-level", type=str.upper, choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help=f"터미널 출력 최소 레벨 (기본 {LOG_LEVEL})")
+    parser.add_argument("--log-file", help="로그 파일 (크기가 넘으면 회전)")
+    parser.add_argument("--ctl", nargs="+", metavar="CMD",
+                        help="실행 중인 매크로 제어: status | pause | resume | stop | "
+                             "set target_level=N gold_limit=N [room=이름]")
+    args = parser.parse_args(argv)
+
+    config = {}
+    if args.config:
+        try:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            parser.error(f"설정 파일 읽기 실패: {args.config} ({e})")
+
+    rooms = list(args.rooms or [])
+    if args.room_list:
+        rooms += args.room_list.split(',')
+    if not rooms:
+        value = config.get("rooms", config.get("room", []))
+        rooms = value.split(',') if isinstance(value, str) else list(value)
+    args.rooms = list(dict.fromkeys(r.strip() for r in rooms if r.strip()))
+
+    for key in ("goal", "gold_limit", "level", "backend", "stats_file", "wait", "socket", "log_level", "log_file"):
+        if getattr(args, key) is None:
+            setattr(args, key, config.get(key))
+    if args.backend not in (None, "ax", "ocr"):
+        parser.error(f"backend는 ax 또는 ocr: {args.backend}")
+    if args.socket and not args.ctl and os.path.lexists(args.socket) and not is_socket(args.socket):
+        parser.error(f"--socket 경로가 소켓이 아닌 기존 파일입니다 (지우지 않음): {args.socket}")
+    if args.log_level is not None:
+        try:
+            _level(args.log_level)
+        except ValueError as e:
+            parser.error(str(e))
+
+    levels = str(args.level if args.level is not None else "auto").split(',')
+    if len(levels) == 1:
+        levels *= len(args.rooms)
+    if len(levels) != len(args.rooms):
+        parser.error(f"--level 개수({len(levels)})가 채팅방 수({len(args.rooms)})와 다릅니다.")
+    args.levels = []
+    for value in levels:
+        value = value.strip().lower()
+        if value == "auto":
+            args.levels.append(None)
+        elif value.isdigit():
+            args.levels.append(int(value))
+        else:
+            parser.error(f"--level은 숫자 또는 auto: {value}")
+    return args
+
+
+def detect_current_level(room_name):
+    """채팅방 최근 메시지를 최신 행부터 거꾸로 읽어 현재 레벨 자동 감지. 못 찾으면 None."""
+    if use_ax_api:
+        result = read_chat_rows_ax(room_name, last_n=LEVEL_SCAN_ROWS)
+        if result is not None:
+            level = find_level_in_history(result[1])
+            if level is not None:
+                return level
+            return scan_current_level([t for row in result[1] for t in row])
+    texts = KakaoBackend().read_texts(room_name)
+    if not texts:
+        return None
+    level = find_level_in_history([[t] for t in texts])
+    return level if level is not None else scan_current_level(texts)
+
+
+def resume_session(room_name, checkpoint):
+    """체크포인트로 세션 복원. 레벨은 채팅 기록으로 확인/보정한다.
+    재개할 체크포인트가 없으면 None (레벨 입력/자동 감지로 새로 시작).
+    """
+    entry = checkpoint.get(room_name)
+    if entry is None:
+        return None
+    session = MacroSession(room_name, entry["level"])
+    session.restore(entry)
+    level = detect_current_level(room_name)
+    if level is None:
+        print(f"  [{room_name}] 체크포인트에서 재개: +{entry['level']} (채팅 기록에서 레벨 확인 불가)")
+    elif level != entry["level"]:
+        print(f"  [{room_name}] [재동기화] 체크포인트 +{entry['level']} -> 채팅 기록 +{level}")
+        session.current_level = level
+    else:
+        print(f"  [{room_name}] 체크포인트에서 재개: +{level} (채팅 기록 확인)")
+    return session
+
+
+def wait_for_window(room_name, timeout):
+    """채팅방 창이 나타날 때까지 대기 (재시작 직후 카카오톡이 아직 안 떠 있을 수 있음)."""
+    deadline = time.monotonic() + timeout
+    while not find_kakao_window(room_name):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(1.0)
+    return True
+
+
+def run_headless(args):
+    """입력 없이 바로 매크로 실행 (무인 재시작용). 종료 코드 반환.
+    0 = 목표/골드 리밋 도달 또는 사용자 중단, 1 = 시작 실패, 3 = 채팅방 창 사라짐 (재시작 대상)
+    """
+    global TARGET_LEVEL, GOLD_LIMIT, STATS_FILE, CONTROL_SOCKET, stop_requested, use_ax_api
+
+    if args.socket:
+        CONTROL_SOCKET = args.socket
+    if args.goal is not None:
+        TARGET_LEVEL = args.goal
+    if args.gold_limit is not None:
+        GOLD_LIMIT = args.gold_limit
+    if args.stats_file:
+        STATS_FILE = args.stats_file
+    if args.backend == "ax" and not AX_AVAILABLE:
+        print("[오류] AX API(pyobjc)가 없습니다. pip install pyobjc")
+        return 1
+    if args.backend == "ocr" or (args.backend is None and not AX_AVAILABLE):
+        if not OCR_AVAILABLE:
+            print("[오류] OCR(easyocr)이 없습니다. pip install easyocr pyautogui numpy")
+            return 1
+        use_ax_api = False
+    else:
+        use_ax_api = True
+
+    wait = WINDOW_WAIT_TIMEOUT if args.wait is None else args.wait
+    checkpoint = Checkpoint()
+    sessions = []
+    for room, level in zip(args.rooms, args.levels):
+        if not wait_for_window(room, wait):
+            print(f"[오류] '{room}' 채팅방 창을 찾을 수 없습니다 ({wait:g}초 대기).")
+            return 1
+        if level is not None:
+            sessions.append(MacroSession(room, level))
+            continue
+        session = resume_session(room, checkpoint)
+        if session is None:
+            level = detect_current_level(room)
+            if level is None:
+                print(f"[오류] '{room}' 현재 레벨 자동 감지 실패. --level로 지정하세요.")
+                return 1
+            print(f"  [{room}] 현재 레벨 자동 감지: +{level}")
+            session = MacroSession(room, level)
+        sessions.append(session)
+
+    stop_requested = False
+    gold_limit_str = f"{GOLD_LIMIT:,}G" if GOLD_LIMIT > 0 else "없음"
+    print(f"  매크로 시작 - 대상: {', '.join(args.rooms)}, 목표=+{TARGET_LEVEL}, 골드리밋={gold_limit_str}, "
+          f"읽기 모드: {'AX API' if use_ax_api else 'OCR'}")
+    stats = EnhanceStats(STATS_FILE)
+    _run_engine(stats, sessions, checkpoint)
+    print("\n매크로 종료")
+    if any(session.finish_reason == 'window' for session in sessions):
+        return 3
+    return 0
+
+
+def send_control(request, path=None, timeout=CONTROL_TIMEOUT):
+    """실행 중인 매크로의 제어 소켓에 요청 하나를 보내고 응답 dict 반환."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path or CONTROL_SOCKET)
+        sock.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode('utf-8'))
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+def run_control_client(args):
+    """--ctl 명령 실행. 종료 코드 반환 (0 = 성공)."""
+    path = args.socket or CONTROL_SOCKET
+    if not path:
+        print("[오류] 제어 소켓 경로가 없습니다. --socket으로 지정하세요.")
+        return 1
+    cmd, *params = args.ctl
+    request = {"cmd": cmd}
+    for param in params:
+        key, sep, value = param.partition("=")
+        if not sep:
+            print(f"[오류] key=value 형식이어야 합니다: {param}")
+            return 1
+        request[key] = value.replace(",", "") if key != "room" else value
+    try:
+        response = send_control(request, path)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[오류] 제어 소켓 연결 실패: {path} ({e})")
+        return 1
+    if cmd == "status" and response.get("ok"):
+        state = "일시정지" if response["paused"] else "실행 중"
+        print(f"  [{state}] 경과 {response['elapsed_sec']:.0f}초")
+        for s in response["sessions"]:
+            gold = f"{s['gold']:,}G" if s["gold"] is not None else "-"
+            print(f"  {s['room']}: +{s['level']} (목표 +{s['target_level']}), 골드 {gold}, "
+                  f"시도 {s['attempts']}회 ({s['attempts_per_min']}회/분)"
+                  + (f" - {s['finished']}" if s["finished"] else ""))
+        for name, phase in response["phases"].items():
+            print(f"    {name:<14} p50 {phase['p50_ms']:.1f}ms, p95 {phase['p95_ms']:.1f}ms ({phase['count']}회)")
+    else:
+        print(json.dumps(response, ensure_ascii=False))
+    return 0 if response.get("ok") else 1
+
+
 if __name__ == "__main__":
+    cli_args = parse_args()
+    if cli_args.log_level:
+        LOG_LEVEL = cli_args.log_level.upper()
+    if cli_args.log_file:
+        LOG_FILE = cli_args.log_file
+    if cli_args.ctl:
+        sys.exit(run_control_client(cli_args))
+    if cli_args.rooms:
+        sys.exit(run_headless(cli_args))
     main()
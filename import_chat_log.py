@@ -0,0 +1,261 @@
+"""
+카카오톡 대화 내보내기 파일 → 강화 통계 가져오기
+내보낸 채팅 기록에서 봇의 강화 응답을 찾아 레벨별 성공/유지/파괴와 남은 골드를
+enhance_stats.db에 합산합니다. 파일을 메모리 맵으로 한 줄씩 읽으므로 파일 크기와 무관하게 메모리 사용량이 일정합니다.
+
+지원 형식:
+- 모바일:   2024. 3. 5. 오후 3:12, 이름 : 메시지
+- 안드로이드: 2024년 3월 5일 오후 3:12, 이름 : 메시지
+- PC:       --------------- 2024년 3월 5일 화요일 --------------- / [이름] [오후 3:12] 메시지
+- macOS CSV: 2024-03-05 15:12:00,"이름","메시지"
+여러 줄 메시지는 다음 메시지 시작 줄 전까지 이어 붙입니다.
+
+사용법: python3 import_chat_log.py 대화.txt [--db enhance_stats.db] [--room 채팅방] [--dry-run]
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import time
+from collections import deque
+
+import enhance_macro as em
+
+BATCH_SIZE = 5000       # 한 트랜잭션에 기록하는 시도 수
+
+_MOBILE_RE = re.compile(r'(\d{4})\. (\d{1,2})\. (\d{1,2})\. (오전|오후) (\d{1,2}):(\d{2})(?:, (.+?) : (.*))?')
+_ANDROID_RE = re.compile(r'(\d{4})년 (\d{1,2})월 (\d{1,2})일 (오전|오후) (\d{1,2}):(\d{2})(?:, (.+?) : (.*))?')
+_CSV_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2}),"((?:[^"]|"")*)","(.*)')
+_DATE_HEADER_RE = re.compile(r'-*\s*(\d{4})년 (\d{1,2})월 (\d{1,2})일 \S+요일\s*-*')
+_PC_RE = re.compile(r'\[(.+?)\] \[(오전|오후) (\d{1,2}):(\d{2})\] (.*)')
+_RESULT_HINT_RE = re.compile('|'.join(map(re.escape, [
+    em.SUCCESS_TEXT, em.FAIL_TEXT, em.KEEP_TEXT, '강화 성공', '속보', '→', '->', '▶', '[+0]'])))
+_BRACKET_LEVEL_RE = re.compile(r'\[\+(\d+)\]')
+
+
+def _hour(ampm, hour):
+    hour = int(hour) % 12
+    return hour + 12 if ampm == '오후' else hour
+
+
+def _timestamp(year, month, day, hour, minute, second=0):
+    return time.mktime((int(year), int(month), int(day), hour, int(minute), int(second), 0, 0, -1))
+
+
+def iter_lines(path):
+    """파일을 메모리 맵으로 열어 한 줄씩 (str) 반환."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)   # 읽은 페이지는 커널이 바로 회수
+            first = True
+            for raw in iter(mm.readline, b""):
+                line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+                if first:
+                    line = line.lstrip('\ufeff')
+                    first = False
+                yield line
+
+
+def iter_messages(lines):
+    """줄 단위 입력을 (시각, 보낸 사람, 메시지 텍스트) 단위로 묶는다. 시스템 메시지는 보낸 사람 None."""
+    current = None        # [ts, sender, lines, csv]
+    day = None            # PC 형식 날짜 헤더 (년, 월, 일)
+    for line in lines:
+        start = None
+        head = line[:1]
+        if head.isdigit():
+            m = _MOBILE_RE.match(line) or _ANDROID_RE.match(line)
+            if m:
+                y, mo, d, ampm, h, mi, sender, text = m.groups()
+                # 보낸 사람이 없으면 입장/퇴장 등 시스템 메시지
+                start = (_timestamp(y, mo, d, _hour(ampm, h), mi), sender, text or '', False)
+            else:
+                m = _CSV_RE.match(line)
+                if m:
+                    y, mo, d, h, mi, sec, sender, text = m.groups()
+                    start = (_timestamp(y, mo, d, int(h), mi, sec), sender.replace('""', '"'), text, True)
+                else:
+                    m = _DATE_HEADER_RE.fullmatch(line)
+                    if m:
+                        day = m.groups()
+                        start = (None, None, None, False)
+        elif head == '[':
+            m = _PC_RE.match(line)
+            if m and day is not None:
+                sender, ampm, h, mi, text = m.groups()
+                start = (_timestamp(*day, _hour(ampm, h), mi), sender, text, False)
+        elif head == '-':
+            m = _DATE_HEADER_RE.fullmatch(line)
+            if m:
+                day = m.groups()
+                start = (None, None, None, False)
+
+        if start is None:
+            if current is not None:
+                current[2].append(line)   # 여러 줄 메시지의 이어지는 줄
+            continue
+        if current is not None:
+            yield _finish(current)
+        ts, sender, text, is_csv = start
+        current = [ts, sender, [text], is_csv] if ts is not None else None
+    if current is not None:
+        yield _finish(current)
+
+
+def _finish(current):
+    ts, sender, lines, is_csv = current
+    if is_csv:
+        last = lines[-1]
+        if last.endswith('"'):
+            lines[-1] = last[:-1]
+        lines = [line.replace('""', '"') for line in lines]
+    return ts, sender, lines
+
+
+class ChatLogImporter:
+    """메시지 스트림에서 강화 시도를 복원. 명령어를 보낸 사람별로 레벨/골드를 추적한다.
+
+    봇 응답 판정은 매크로와 같은 classify_response를 쓰고, 응답은 가장 먼저 대기 중인
+    명령어 전송자에게 배정한다 (여러 명이 번갈아 강화하는 채팅방 대응).
+    """
+
+    def __init__(self, room_name=None, command=em.COMMAND):
+        self.room_name = room_name
+        self.command = command
+        self.pending = deque()      # 응답을 기다리는 명령어 전송자 (FIFO)
+        self.levels = {}            # 전송자 -> 현재 레벨
+        self.golds = {}             # 전송자 -> 마지막 남은 골드
+        self.lines = 0
+        self.messages = 0
+        self.results = {"success": 0, "keep": 0, "destroy": 0}
+        self.unattributed = 0       # 레벨을 알 수 없어 버린 응답
+        self.gold_spent = 0
+        self.gold_samples = 0
+        self.already_imported = 0   # 이전 실행에서 이미 기록돼 건너뛴 시도
+
+    def _level_of(self, result, from_lvl, to_lvl, requester, text):
+        if from_lvl is not None:
+            return from_lvl
+        if result == 'success' and to_lvl is not None:
+            return to_lvl - 1
+        if result == 'keep':
+            match = _BRACKET_LEVEL_RE.search(text)
+            if match and int(match.group(1)) <= em.MAX_LEVEL:
+                return int(match.group(1))
+        return self.levels.get(requester)
+
+    def attempts(self, messages):
+        """(시각, 보낸 사람, 줄들) 스트림 → StatsStore 시도 행 스트림."""
+        for ts, sender, lines in messages:
+            self.messages += 1
+            if len(lines) == 1 and lines[0].strip() == self.command:
+                self.pending.append(sender)
+                continue
+            text = ' '.join(lines)
+            if not _RESULT_HINT_RE.search(text):
+                continue
+            requester = self.pending[0] if self.pending else None
+            result, from_lvl, to_lvl = em.classify_response(lines, lines, self.levels.get(requester))
+            if result not in self.results:
+                continue
+            if self.pending:
+                self.pending.popleft()
+            level = self._level_of(result, from_lvl, to_lvl, requester, text)
+            gold = em.parse_remaining_gold(lines)
+            if gold is not None:
+                previous = self.golds.get(requester)
+                if previous is not None and previous >= gold:
+                    self.gold_spent += previous - gold
+                    self.gold_samples += 1
+                self.golds[requester] = gold
+            if result == 'success':
+                next_level = to_lvl if to_lvl is not None else (level + 1 if level is not None else None)
+            elif result == 'destroy':
+                next_level = 0
+            else:
+                next_level = level
+            self.levels[requester] = next_level
+            if level is None:
+                self.unattributed += 1
+                continue
+            self.results[result] += 1
+            stored = 'fail' if result == 'destroy' else result
+            yield (ts, self.room_name, level, stored, next_level, gold, 'import')
+
+
+def _file_key(path):
+    """같은 파일을 다시 가져와도 중복 집계하지 않도록 파일 식별자 (크기 + 앞 64KB 해시)."""
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read(65536)).hexdigest()[:16]
+    return f"chat_import:{os.path.getsize(path)}:{digest}"
+
+
+def import_chat_log(path, stats, room_name=None, dry_run=False):
+    """대화 파일을 가져와 통계 DB에 합산. 가져오기 진행 수를 같은 트랜잭션에 기록해
+    중단 후 다시 실행하면 이어서, 끝난 파일은 건너뛴다. ChatLogImporter 반환.
+    """
+    store = stats.store
+    key = _file_key(path)
+    resume_from = int(store.get_meta(key, 0))
+    done = resume_from
+    importer = ChatLogImporter(room_name)
+
+    def counted_lines():
+        for line in iter_lines(path):
+            importer.lines += 1
+            yield line
+
+    skipped = 0
+    batch = []
+    for attempt in importer.attempts(iter_messages(counted_lines())):
+        if skipped < resume_from:
+            skipped += 1       # 이전 실행에서 이미 기록된 시도
+            continue
+        if dry_run:
+            continue
+        batch.append(attempt)
+        if len(batch) >= BATCH_SIZE:
+            done += len(batch)
+            store.record(batch, meta={key: done})
+            batch = []
+    if batch:
+        store.record(batch, meta={key: done + len(batch)})
+    importer.already_imported = skipped
+    return importer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="카카오톡 대화 내보내기 파일에서 강화 통계 가져오기")
+    parser.add_argument("chat_log", help="내보낸 대화 파일 (.txt 또는 .csv)")
+    parser.add_argument("--db", default=em.STATS_FILE, help=f"통계 DB (기본 {em.STATS_FILE})")
+    parser.add_argument("--room", help="채팅방 이름 (기본: 파일 이름)")
+    parser.add_argument("--dry-run", action="store_true", help="DB에 쓰지 않고 집계만 출력")
+    args = parser.parse_args()
+
+    room = args.room or os.path.splitext(os.path.basename(args.chat_log))[0]
+    stats = em.EnhanceStats(filename=None if args.dry_run else args.db)
+    start = time.perf_counter()
+    importer = import_chat_log(args.chat_log, stats, room, dry_run=args.dry_run)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    r = importer.results
+    print("\n" + "=" * 55)
+    print(f"  가져오기 완료: {args.chat_log} -> {'(dry-run)' if args.dry_run else args.db}")
+    print(f"  {importer.lines:,}줄, 메시지 {importer.messages:,}개, {elapsed:.1f}초 "
+          f"({importer.lines / elapsed * 60:,.0f}줄/분)")
+    print(f"  시도 {sum(r.values()):,}회 (성공 {r['success']:,}, 유지 {r['keep']:,}, 파괴 {r['destroy']:,}), "
+          f"레벨 불명 제외 {importer.unattributed:,}회")
+    if importer.already_imported:
+        print(f"  이전에 가져온 {importer.already_imported:,}회는 건너뜀")
+    if importer.gold_samples:
+        print(f"  시도당 평균 골드 소모: {importer.gold_spent / importer.gold_samples:,.0f}G "
+              f"({importer.gold_samples:,}회 기준)")
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    main()
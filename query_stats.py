@@ -0,0 +1,75 @@
+"""
+강화 통계 조회 (enhance_stats.db)
+레벨별 성공률을 최근 N회/최근 기간/채팅방별로, 또는 시간대(0~23시)별로 95% 신뢰구간과 함께 출력합니다.
+모든 조회는 인덱스와 시간별 집계만 읽으므로 시도 기록이 수천만 건이어도 수 밀리초 안에 끝납니다.
+
+사용법:
+    python3 query_stats.py                        # 레벨별 누적 성공률
+    python3 query_stats.py --level 12 --last 2000 # +12 최근 2000회
+    python3 query_stats.py --days 7 --room 강화방  # 최근 7일, 채팅방 지정
+    python3 query_stats.py --by-hour --level 10   # +10 시간대별
+"""
+import argparse
+import json
+import time
+
+import enhance_macro as em
+
+
+def format_rates(rates, label):
+    lines = [f"  {label:<8}{'성공률':>8}{'95% 신뢰구간':>18}{'성공':>9}{'유지':>9}{'파괴':>9}{'합계':>10}"]
+    for key, r in rates.items():
+        name = f"+{key}" if label == "레벨" else f"{key:02d}시"
+        rate = f"{r['rate'] * 100:.1f}%" if r["rate"] is not None else "-"
+        low, high = r["ci"]
+        lines.append(f"  {name:<8}{rate:>9}{f'{low * 100:.1f}~{high * 100:.1f}%':>18}"
+                     f"{r['success']:>10,}{r['keep']:>10,}{r['fail']:>10,}{r['total']:>11,}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="강화 통계 조회")
+    parser.add_argument("--db", default=em.STATS_FILE, help=f"통계 DB (기본 {em.STATS_FILE})")
+    parser.add_argument("--level", type=int, help="레벨 하나만 (+N -> +N+1 시도)")
+    parser.add_argument("--last", type=int, help="레벨마다 최근 N회만")
+    parser.add_argument("--days", type=float, help="최근 N일만")
+    parser.add_argument("--hours", type=float, help="최근 N시간만")
+    parser.add_argument("--room", help="채팅방 지정")
+    parser.add_argument("--by-hour", action="store_true", help="시간대(0~23시)별 성공률")
+    parser.add_argument("--json", action="store_true", help="JSON으로 출력")
+    args = parser.parse_args()
+    if args.last is not None and (args.days or args.hours):
+        parser.error("--last와 --days/--hours는 함께 쓸 수 없습니다.")
+
+    since = None
+    if args.days or args.hours:
+        since = time.time() - (args.days or 0) * 86400 - (args.hours or 0) * 3600
+    store = em.StatsStore(args.db)
+    start = time.perf_counter()
+    if args.by_hour:
+        rates = store.hour_of_day_rates(level=args.level, since=since, room=args.room)
+        label = "시간대"
+    else:
+        rates = store.level_rates(level=args.level, last_n=args.last, since=since, room=args.room)
+        label = "레벨"
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps({str(k): v for k, v in rates.items()}, ensure_ascii=False, indent=2))
+        return
+    scope = []
+    if args.last:
+        scope.append(f"레벨별 최근 {args.last:,}회")
+    if since is not None:
+        scope.append(time.strftime("%Y-%m-%d %H:00 이후", time.localtime(since)))
+    if args.room:
+        scope.append(f"채팅방 {args.room}")
+    print("=" * 75)
+    print(f"  {args.db}: {', '.join(scope) or '전체 누적'} ({elapsed * 1000:.1f}ms)")
+    print("-" * 75)
+    print(format_rates(rates, label) if rates else "  기록 없음")
+    print("=" * 75)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+트레이스 재생 스크립트 (macOS/카카오톡 불필요)
+enhance_macro.py의 TRACE_FILE로 기록한 파일을 매크로 엔진에 그대로 다시 흘려
+동기화 오류/파괴 오판 등을 재현하고, 판정 로직 변경 전후 결과를 비교합니다.
+
+사용법: python3 replay_trace.py trace.jsonl [--stats 결과.db]
+"""
+import argparse
+import time
+
+import enhance_macro as em
+
+
+def main():
+    parser = argparse.ArgumentParser(description="트레이스 파일 재생")
+    parser.add_argument("trace", help="TRACE_FILE로 기록한 파일 (.jsonl 또는 .jsonl.gz)")
+    parser.add_argument("--stats", default=None, help="재생 결과 통계 DB 파일 (기본: 저장 안 함)")
+    args = parser.parse_args()
+
+    stats = em.EnhanceStats(filename=args.stats)
+    start = time.perf_counter()
+    sessions, replay = em.replay_trace(args.trace, stats)
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "=" * 55)
+    print(f"  재생 완료: {args.trace} ({elapsed * 1000:.1f}ms, 기록 시간 {replay.now:.1f}초)")
+    for session in sessions:
+        o = session.outcomes
+        print(f"  {session.room_name}: +{session.current_level}, 시도 {session.attempts}회 "
+              f"(성공 {o['success']}, 유지 {o['keep']}, 파괴 {o['destroy']}, "
+              f"시간초과 {o['waiting'] + o['unknown']}) - {session.finish_reason}")
+    if replay.mismatches:
+        print(f"\n  [불일치] 기록과 다른 호출 흐름 {len(replay.mismatches)}건")
+        for t, room, kind, skipped in replay.mismatches[:20]:
+            print(f"    {t:8.3f}초 {room}: '{kind}' 호출 전 이벤트 {skipped}개 건너뜀")
+    else:
+        print("\n  기록과 호출 흐름 일치")
+    data = stats.data
+    print(f"  통계 반영: 시도 {data['total_attempts']}회, 파괴 {data['total_destroys']}회, "
+          f"재전송 {data['send_retries']}회")
+    print("=" * 55)
+
+
+if __name__ == "__main__":
+    main()
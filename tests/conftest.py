@@ -0,0 +1,28 @@
+"""테스트 공통 설정: 저장소 루트의 enhance_macro / bench_macro를 import할 수 있게 경로 추가, 엔진 실행 헬퍼."""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def run_engine():
+    """run_engine(engine, session, done): done()이 참이 되거나 timeout초가 지나면 엔진을 멈춘다."""
+    def _run(engine, session, done, timeout=10.0):
+        async def _watch():
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while not done() and loop.time() < deadline:
+                await asyncio.sleep(0.005)
+            engine.stop()
+
+        async def _main():
+            watcher = asyncio.ensure_future(_watch())
+            await engine.run(session)
+            watcher.cancel()
+
+        asyncio.run(_main())
+    return _run
@@ -0,0 +1,52 @@
+"""Checkpoint (채팅방별 재개 지점) 테스트."""
+import json
+import multiprocessing
+
+import enhance_macro as em
+
+
+def _save_room(path, room, level, rounds):
+    checkpoint = em.Checkpoint(path)
+    session = em.MacroSession(room, level)
+    for i in range(rounds):
+        session.attempts = i
+        checkpoint.update([session])
+        checkpoint.write(checkpoint.serialize())
+
+
+def test_processes_on_different_rooms_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    # 둘 다 빈 파일 상태에서 시작해 번갈아 저장
+    workers = [multiprocessing.Process(target=_save_room, args=(path, room, level, 200))
+               for room, level in (("방1", 3), ("방2", 7))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    checkpoint = em.Checkpoint(path)
+    assert checkpoint.get("방1")["level"] == 3
+    assert checkpoint.get("방2")["level"] == 7
+    assert checkpoint.get("방1")["attempts"] == 199
+
+
+def test_stale_loaded_entry_does_not_overwrite_other_room(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    first = em.Checkpoint(path)           # 방2 항목이 생기기 전에 읽음
+    _save_room(path, "방2", 7, 1)
+    first.update([em.MacroSession("방1", 3)])
+    first.save()
+    with open(path, encoding='utf-8') as f:
+        rooms = json.load(f)["rooms"]
+    assert set(rooms) == {"방1", "방2"}
+
+
+def test_snapshot_has_no_process_local_message_id():
+    session = em.MacroSession("방", 5)
+    session.journal.observe_texts(["a", "b"])
+    entry = session.snapshot()
+    assert "last_id" not in entry
+    restored = em.MacroSession("방", entry["level"])
+    restored.restore(entry)
+    assert restored.journal.last_id == -1
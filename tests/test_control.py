@@ -0,0 +1,49 @@
+"""제어 소켓 테스트."""
+import os
+import socket
+
+import pytest
+
+import bench_macro as bm
+import enhance_macro as em
+
+
+def _engine():
+    engine = em.MacroEngine(em.EnhanceStats(filename=None), backend=bm.SimulatedBot(seed=0))
+    return engine, em.MacroSession("테스트방", 0, target_level=em.MAX_LEVEL + 1)
+
+
+def test_regular_file_is_not_removed(monkeypatch, run_engine, tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text('{"keep": true}')
+    monkeypatch.setattr(em, "CONTROL_SOCKET", str(path))
+    engine, session = _engine()
+    run_engine(engine, session, lambda: session.attempts >= 3)
+    assert path.read_text() == '{"keep": true}'
+
+
+def test_stale_socket_is_replaced(monkeypatch, run_engine, tmp_path):
+    path = str(tmp_path / "macro.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()                      # 듣는 프로세스 없이 남은 소켓 파일
+    monkeypatch.setattr(em, "CONTROL_SOCKET", path)
+    engine, session = _engine()
+    statuses = []
+
+    def _done():
+        if session.attempts >= 3 and not statuses:
+            statuses.append(em.send_control({"cmd": "status"}, path))
+        return bool(statuses)
+
+    run_engine(engine, session, _done)
+    assert statuses[0]["ok"]
+    assert not os.path.exists(path)
+
+
+def test_cli_refuses_non_socket_path(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text("{}")
+    with pytest.raises(SystemExit):
+        em.parse_args(["--room", "방", "--socket", str(path)])
+    assert path.exists()
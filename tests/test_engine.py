@@ -0,0 +1,90 @@
+"""MacroEngine / MessageJournal / 응답 판정 테스트 (카카오톡 없이 시뮬레이션 봇 상대)."""
+import pytest
+
+import bench_macro as bm
+import enhance_macro as em
+
+
+# ---------- MessageJournal ----------
+def test_journal_first_observation_is_baseline():
+    journal = em.MessageJournal()
+    assert journal.observe_rows(10, [["a"], ["b"]]) == 0
+    assert journal.last_id == -1
+    assert journal.since(-1) == []
+
+
+def test_journal_rows_by_row_count():
+    journal = em.MessageJournal()
+    journal.observe_rows(10, [["a"], ["b"]])
+    mark = journal.last_id
+    assert journal.observe_rows(12, [["a"], ["b"], [em.COMMAND], ["봇 응답", "남은 골드: 1G"]]) == 3
+    assert journal.since(mark) == [em.COMMAND, "봇 응답", "남은 골드: 1G"]
+
+
+def test_journal_repeated_text_is_new_row():
+    journal = em.MessageJournal()
+    journal.observe_rows(1, [["같은 말"]])
+    journal.observe_rows(2, [["같은 말"], ["같은 말"]])
+    assert journal.since(-1) == ["같은 말"]
+
+
+def test_journal_alignment_when_row_count_capped():
+    journal = em.MessageJournal()
+    journal.observe_rows(5, [["a"], ["b"], ["c"]])
+    mark = journal.last_id
+    # 테이블 행 제한으로 행 수는 그대로지만 내용이 한 줄 밀림
+    journal.observe_rows(5, [["b"], ["c"], ["d"]])
+    assert journal.since(mark) == ["d"]
+
+
+def test_journal_texts_alignment():
+    journal = em.MessageJournal()
+    assert journal.observe_texts(["a", "b"]) == 2
+    assert journal.observe_texts(["a", "b"]) == 0
+    assert journal.observe_texts(["b", "c", "c"]) == 2
+    assert journal.since(1) == ["c", "c"]
+
+
+def test_journal_since_bounded_by_ring():
+    journal = em.MessageJournal(maxlen=3)
+    journal.observe_texts([str(i) for i in range(10)])
+    assert journal.last_id == 9
+    assert journal.since(-1) == ["7", "8", "9"]
+
+
+# ---------- 응답 판정 ----------
+def test_own_command_row_is_not_a_reply():
+    screen = ["+3 → +4 강화에 성공", "남은 골드: 1,000G", em.COMMAND]
+    assert em.classify_response([em.COMMAND], screen, 4) == ('waiting', None, None)
+
+
+def test_no_full_screen_fallback_before_command():
+    # 명령어 뒤에 레벨 변화 없는 잡담만 있으면 화면의 이전 응답으로 성공 판정하지 않는다
+    screen = ["+3 → +4", em.COMMAND, "ㅋㅋㅋ"]
+    assert em.classify_response([em.COMMAND, "ㅋㅋㅋ"], screen, 4)[0] == 'unknown'
+
+
+def test_reply_after_command_is_classified():
+    new = [em.COMMAND, f"{em.SUCCESS_TEXT}하셨습니다! +4 → +5", "남은 골드: 900G"]
+    assert em.classify_response(new, new, 4) == ('success', 4, 5)
+
+
+# ---------- 엔진 ----------
+@pytest.mark.parametrize("reply_delay", [0.0, 0.05])
+def test_engine_outcomes_match_bot(monkeypatch, run_engine, reply_delay):
+    """응답 지연이 폴링 주기보다 길어도 봇이 보낸 결과만큼만 판정한다 (거짓 성공/재전송 없음)."""
+    monkeypatch.setattr(em, "REPLY_POLL_INTERVAL", 0.01)
+    bot = bm.SimulatedBot(seed=0, reply_delay=reply_delay)
+    sends = []
+    send = bot.send
+    bot.send = lambda command, room_name, stats=None: sends.append(command) or send(command, room_name, stats)
+    engine = em.MacroEngine(em.EnhanceStats(filename=None), backend=bot)
+    session = em.MacroSession("테스트방", 0, target_level=em.MAX_LEVEL + 1)
+    run_engine(engine, session, lambda: sum(bot.outcomes.values()) >= 15)
+
+    judged = {k: session.outcomes[k] for k in bot.outcomes}
+    assert sum(bot.outcomes.values()) >= 15
+    assert judged == bot.outcomes
+    assert session.current_level == bot.level
+    # 응답을 받기 전에 다시 보내지 않는다 (마지막 1건은 멈출 때 응답 대기 중일 수 있음)
+    assert len(sends) - sum(bot.outcomes.values()) <= 1
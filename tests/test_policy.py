@@ -0,0 +1,66 @@
+"""PolicyTable (남은 골드로 목표 도달 확률) 테스트."""
+import random
+
+import enhance_macro as em
+
+
+def make_table(rates, costs):
+    table = em.PolicyTable()
+    table.set_rates({level: {"total": 1000, "success": round(p * 1000), "fail": round(d * 1000),
+                             "keep": 1000 - round(p * 1000) - round(d * 1000)}
+                     for level, (p, d) in rates.items()})
+    table.set_costs(costs)
+    return table
+
+
+def monte_carlo(rates, costs, level, budget, target, trials, seed=0):
+    rng = random.Random(seed)
+    reached = 0
+    for _ in range(trials):
+        lvl, gold = level, budget
+        while lvl < target and gold >= costs[lvl]:
+            gold -= costs[lvl]
+            roll = rng.random()
+            p, d = rates[lvl]
+            if roll < p:
+                lvl += 1
+            elif roll < p + d:
+                lvl = 0
+        reached += lvl >= target
+    return reached / trials
+
+
+def test_matches_monte_carlo():
+    rates = {0: (0.9, 0.0), 1: (0.8, 0.05), 2: (0.7, 0.1), 3: (0.6, 0.1), 4: (0.5, 0.15), 5: (0.4, 0.2)}
+    costs = {0: 1000, 1: 1500, 2: 2500, 3: 4000, 4: 6000, 5: 9000}
+    table = make_table(rates, costs)
+    for budget in (30_000, 60_000, 120_000):
+        expected = monte_carlo(rates, costs, 0, budget, 6, trials=20_000)
+        assert abs(table.prob(0, budget, 6) - expected) < 0.015, budget
+
+
+def test_cost_not_rounded_to_cheapest_level():
+    # 1000G 한 번 + 1499G 14번 = 21,986G: 20,000G로는 +15에 도달할 수 없다
+    costs = {0: 1000, **{level: 1499 for level in range(1, em.MAX_LEVEL)}}
+    table = em.PolicyTable()
+    table.set_rates({})
+    table.set_costs(costs)
+    assert table.prob(0, 20_000, 15) == 0.0
+    assert table.prob(0, 22_000, 15) > 0.0
+
+
+def test_bucket_width_error_bound():
+    costs = [1000, 1234, 1499, 7777]
+    bucket = em.PolicyTable.bucket_width(costs)
+    for cost in costs:
+        assert abs(round(cost / bucket) * bucket - cost) <= em.POLICY_COST_ERROR * cost
+    assert em.PolicyTable.bucket_width([1000, 1500]) == 500
+
+
+def test_cheap_levels_not_overcharged_for_large_budget():
+    # 구간 수를 넘는 골드는 폭을 넓혀 비용을 부풀리지 않고 판단 보류
+    table = em.PolicyTable()
+    table.set_rates({})
+    table.set_costs({level: 10 for level in range(em.MAX_LEVEL)})
+    assert table.prob(0, 10 ** 9, 15) is None
+    assert table.prob(0, 150, 15) > 0.0
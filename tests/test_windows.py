@@ -0,0 +1,44 @@
+"""채팅방 이름 → 창 제목 매칭 테스트."""
+import bench_macro as bm
+import enhance_macro as em
+
+
+def test_exact_match_ignores_spacing_and_case():
+    assert em.match_title("강화 봇방", ["강화봇방", "다른방"]) == "강화봇방"
+    assert em.match_title("ALPHA", ["alpha", "beta"]) == "alpha"
+
+
+def test_unique_substring_match():
+    assert em.match_title("강화봇", ["강화봇방 (3)", "잡담방"]) == "강화봇방 (3)"
+
+
+def test_ambiguous_substring_is_rejected():
+    assert em.match_title("a", ["alpha", "beta"]) is None
+    assert em.match_title("강화방", ["강화방1", "강화방2"]) is None
+
+
+def test_no_similarity_match_by_default():
+    assert em.match_title("강화방1", ["강화방2"]) is None
+
+
+def test_fuzzy_only_on_request():
+    assert em.match_title("강화방1", ["강화방2", "잡담"], fuzzy=True) == "강화방2"
+    assert em.match_title("전혀다름", ["강화방2"], fuzzy=True) is None
+
+
+def test_registry_does_not_resolve_similar_room():
+    app = bm.make_ax_tree("강화방2", 5, other_windows=2)
+    with bm.fake_ax(app, 0.0):
+        em.WINDOWS.invalidate()
+        assert em.find_kakao_window("강화방1") is None
+        assert em.find_kakao_window("강화방2") == "강화방2"
+
+
+def test_choose_window_asks_before_using_suggestion(monkeypatch):
+    app = bm.make_ax_tree("강화방2", 5)
+    with bm.fake_ax(app, 0.0):
+        em.WINDOWS.invalidate()
+        monkeypatch.setattr("builtins.input", lambda prompt: "n")
+        assert em.choose_kakao_window("강화방1") is None
+        monkeypatch.setattr("builtins.input", lambda prompt: "y")
+        assert em.choose_kakao_window("강화방1") == "강화방2"